@@ -1,31 +1,70 @@
 """
 FastAPI ⇆ Prefect 3 — on-demand Sentinel / Landsat processing
-POST /run     → queue a flow-run (one Dask cluster, all AOIs)
-GET  /status  → fetch run state
+POST /run     → queue a flow-run (one Dask cluster, all AOIs); identical
+                requests are coalesced / reused, small ones are batched
+GET  /status  → fetch run state (served from the watcher snapshot when watched)
+GET  /events  → server-sent events: state changes + stage progress of a run
+GET  /tiles   → XYZ web-mercator PNG tiles rendered from the derived COGs
 """
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
+import hashlib
+import json
 import os, re, uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from functools import lru_cache
-from typing import List, Optional, Tuple
+from pathlib import Path
+from typing import AsyncIterator, List, Literal, Optional, Tuple
+from uuid import UUID
 
 import httpx
-from fastapi import FastAPI, HTTPException, status
+import pystac
+from fastapi import FastAPI, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
 from shapely.geometry import box
 from shapely.errors import TopologicalError
 from shapely.validation import explain_validity
 from prefect import get_client
+from prefect.client.orchestration import PrefectClient
+from prefect.client.schemas.filters import FlowRunFilter, FlowRunFilterTags, ArtifactFilter, \
+    ArtifactFilterFlowRunId, ArtifactFilterType
+from prefect.client.schemas.sorting import FlowRunSort
 from prefect.exceptions import ObjectNotFound
 
-from config.settings import PREFECT_API_URL
+from config.config import DEFAULT_SINK, DEFAULT_COG_PROFILE, COG_PROFILES, DERIVED_CATALOG_JSON, ZARR_DIR, PROGRESS_ARTIFACT
+from config.settings import PREFECT_API_URL, TILE_THREADS, TILE_CACHE_CONTROL, RUN_REUSE_TTL, \
+    RUN_BATCH_WINDOW, RUN_BATCH_MAX_AREA, RUN_BATCH_MAX_BBOXES, PREFECT_MAX_CONNECTIONS, STATUS_POLL_INTERVAL, \
+    STATUS_TTL, STATUS_WATCH_IDLE, STATUS_WATCH_MAX_RUNS
+from utils.bbox_to_h3 import bbox_to_h3
+from utils.cog_tiles import cached_tile
 
 # Prefect settings 
 os.environ.setdefault("PREFECT_API_URL", PREFECT_API_URL)
 DEPLOYMENT = "eo_monthly_mosaic/eo_monthly_mosaic"   # ← copy from `prefect deployment ls`
 
-app = FastAPI(title="EO on-demand")
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # one pooled Prefect client for the app's lifetime instead of one per request
+    client = get_client(httpx_settings={"limits": httpx.Limits(
+        max_connections=PREFECT_MAX_CONNECTIONS,
+        max_keepalive_connections=PREFECT_MAX_CONNECTIONS,
+    )})
+    async with client:
+        app.state.prefect = client
+        yield
+        await _WATCHER.close()
+
+app = FastAPI(title="EO on-demand", lifespan=_lifespan)
+
+def _prefect() -> PrefectClient:
+    return app.state.prefect
+
+# blocking raster reads never run on the event loop
+_TILE_POOL = ThreadPoolExecutor(max_workers=TILE_THREADS, thread_name_prefix="tiles")
 
 # Band catalogue (STAC) ─────
 _STAC_COLLECTIONS = {
@@ -70,6 +109,8 @@ class IsoInterval(str):
         return cls(v)
 
 # Request model
+CogProfile = Literal[tuple(COG_PROFILES)]   # follows config, like the CLI's choices
+
 class RunRequest(BaseModel):
     bboxes: List[Tuple[float, float, float, float]] = Field(
         ..., min_length=1,
@@ -83,6 +124,14 @@ class RunRequest(BaseModel):
         examples=[["red","nir"]],
     )
     out_dir: Optional[str] = None
+    sink: Literal["cog", "zarr", "both"] = Field(
+        DEFAULT_SINK,
+        description="Write monthly composites as COGs, an appendable Zarr datacube, or both",
+    )
+    cog_profile: CogProfile = Field(
+        DEFAULT_COG_PROFILE,
+        description="COG encoding profile (see COG_PROFILES in config/config.py)",
+    )
 
     # validate every bbox in the list
     @field_validator("bboxes")
@@ -114,26 +163,374 @@ class RunRequest(BaseModel):
             raise ValueError(f"unknown band(s): {', '.join(bad)}")
         return v
 
+# Request coalescing ─────
+def _request_key(req: RunRequest) -> str:
+    """Stable hash of the normalised request (bbox order, band case/order ignored)."""
+    norm = {
+        "bboxes": sorted([round(c, 6) for c in b] for b in req.bboxes),
+        "toi": str(req.toi),
+        "bands": sorted({b.lower() for b in req.bands}),
+        "sink": req.sink,
+        "cog_profile": req.cog_profile,
+        "out_dir": req.out_dir,
+    }
+    return hashlib.sha256(json.dumps(norm, sort_keys=True).encode()).hexdigest()[:16]
+
+def _run_tag(key: str) -> str:
+    return f"req:{key}"
+
+async def _latest_matching_run(key: str):
+    runs = await _prefect().read_flow_runs(
+        flow_run_filter=FlowRunFilter(tags=FlowRunFilterTags(all_=[_run_tag(key)])),
+        sort=FlowRunSort.EXPECTED_START_TIME_DESC,
+        limit=1,
+    )
+    return runs[0] if runs else None
+
+def _reusable_outputs(req: RunRequest) -> Optional[list[dict]]:
+    """
+    Outputs of a previous identical run, if all are still in the derived
+    catalog (items are keyed per AOI and month) and on disk. Blocking: call
+    it off the event loop.
+    """
+    start, end = (d[:7] for d in str(req.toi).split("/"))
+    cogs = [h for h in _derived_cogs().values() if os.path.exists(h)]
+    outputs = []
+    for bbox in req.bboxes:
+        aoi = bbox_to_h3(bbox, res=10)
+        out: dict = {"bbox": list(bbox)}
+        if req.sink in ("cog", "both"):
+            prefix = f"monthly_rgb_{aoi}_"
+            out["cogs"] = sorted(
+                h for h in cogs
+                if Path(h).name.startswith(prefix) and start <= Path(h).stem[len(prefix):] <= end
+            )
+            if not out["cogs"]:
+                return None
+        if req.sink in ("zarr", "both"):
+            store = Path(ZARR_DIR) / f"monthly_rgb_{aoi}.zarr"
+            if not store.exists():
+                return None
+            out["zarr"] = str(store)
+        outputs.append(out)
+    return outputs
+
+async def _create_run(parameters: dict, tags: list[str], name: str) -> dict:
+    client = _prefect()
+    try:
+        dep = await client.read_deployment_by_name(DEPLOYMENT)
+    except ObjectNotFound:
+        raise HTTPException(404, f"Deployment '{DEPLOYMENT}' not found")
+    run = await client.create_flow_run_from_deployment(
+        dep.id, parameters=parameters, name=name, tags=tags,
+    )
+    return {"flow_run_id": str(run.id), "state": run.state.type.value}
+
+class _RunBatcher:
+    """
+    Collects small single-AOI requests that share toi/bands/sink/profile/out_dir for
+    RUN_BATCH_WINDOW seconds and submits them as one multi-bbox flow run.
+    The run is tagged with every member's request hash so later duplicates
+    coalesce onto it.
+    """
+    def __init__(self, window: float, max_bboxes: int):
+        self.window, self.max_bboxes = window, max_bboxes
+        self._pending: dict[tuple, list[tuple[RunRequest, str, asyncio.Future]]] = {}
+        self._flushes: set[asyncio.Task] = set()   # strong refs so flushes aren't GC'd mid-flight
+
+    @staticmethod
+    def is_small(req: RunRequest) -> bool:
+        if len(req.bboxes) != 1:
+            return False
+        minx, miny, maxx, maxy = req.bboxes[0]
+        return (maxx - minx) * (maxy - miny) <= RUN_BATCH_MAX_AREA
+
+    async def submit(self, req: RunRequest, key: str) -> dict:
+        group = (str(req.toi), tuple(sorted(b.lower() for b in req.bands)), req.sink, req.cog_profile, req.out_dir)
+        fut = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(group, [])
+        batch.append((req, key, fut))
+        if len(batch) == 1:
+            self._spawn(self._flush_later(group))
+        elif len(batch) >= self.max_bboxes:
+            self._spawn(self._flush(group))
+        return await fut
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush_later(self, group: tuple) -> None:
+        await asyncio.sleep(self.window)
+        await self._flush(group)
+
+    async def _flush(self, group: tuple) -> None:
+        batch = self._pending.pop(group, None)
+        if not batch:
+            return
+        bboxes = list(dict.fromkeys(tuple(r.bboxes[0]) for r, _, _ in batch))
+        params = batch[0][0].model_dump(exclude_none=True) | {"bboxes": bboxes}
+        tags = sorted({_run_tag(k) for _, k, _ in batch})
+        try:
+            res = await _create_run(params, tags, name=f"api-batch-{uuid.uuid4().hex[:6]}")
+        except Exception as exc:
+            for _, _, f in batch:
+                if not f.done():
+                    f.set_exception(exc)
+            return
+        for _, _, f in batch:
+            if not f.done():
+                f.set_result({**res, "batched": len(bboxes)})
+
+_BATCHER = _RunBatcher(RUN_BATCH_WINDOW, RUN_BATCH_MAX_BBOXES)
+_SUBMITTING: dict[str, asyncio.Future] = {}   # key → submission in progress in this process
+
 # routes 
 @app.post("/run", status_code=status.HTTP_202_ACCEPTED)
 async def run_flow(req: RunRequest):
-    async with get_client() as client:
+    key = _request_key(req)
+
+    # identical request already being submitted by this process
+    if key in _SUBMITTING:
+        return {**await asyncio.shield(_SUBMITTING[key]), "coalesced": True}
+
+    # identical request in flight, or finished recently with outputs still present
+    try:
+        prev = await _latest_matching_run(key)
+    except httpx.HTTPError:
+        prev = None
+    if prev is not None and prev.state and not prev.state.is_final():
+        return {"flow_run_id": str(prev.id), "state": prev.state.type.value, "coalesced": True}
+    if (prev is not None and prev.state and prev.state.is_completed() and prev.end_time
+            and (dt.datetime.now(dt.timezone.utc) - prev.end_time).total_seconds() < RUN_REUSE_TTL):
+        outputs = await asyncio.get_running_loop().run_in_executor(_TILE_POOL, _reusable_outputs, req)
+        if outputs:
+            return {"flow_run_id": str(prev.id), "state": prev.state.type.value,
+                    "reused": True, "outputs": outputs}
+
+    fut = asyncio.get_running_loop().create_future()
+    _SUBMITTING[key] = fut
+    try:
+        if _BATCHER.is_small(req):
+            res = await _BATCHER.submit(req, key)
+        else:
+            res = await _create_run(req.model_dump(exclude_none=True), [_run_tag(key)],
+                                    name=f"api-{uuid.uuid4().hex[:6]}")
+        fut.set_result(res)
+        return res
+    except Exception as exc:
+        fut.set_exception(exc)
+        fut.exception()                   # mark retrieved when nobody else is waiting
+        raise
+    finally:
+        _SUBMITTING.pop(key, None)
+
+# Run progress watcher ─────
+async def _snapshot(flow_run_id: str) -> dict:
+    """Current state + stage progress (table artifacts published by the flow's tasks)."""
+    client = _prefect()
+    try:
+        run = await client.read_flow_run(UUID(flow_run_id))
+    except (ObjectNotFound, ValueError):
+        raise HTTPException(404, f"Run '{flow_run_id}' not found")
+    artifacts = await client.read_artifacts(
+        artifact_filter=ArtifactFilter(
+            flow_run_id=ArtifactFilterFlowRunId(any_=[run.id]),
+            type=ArtifactFilterType(any_=["table"]),
+        ),
+    )
+    progress = []
+    for art in sorted(artifacts, key=lambda a: a.created):
+        if art.description != PROGRESS_ARTIFACT:
+            continue
+        rows = json.loads(art.data) if isinstance(art.data, str) else art.data
+        progress.extend(rows or [])
+    return {
+        "flow_run_id": flow_run_id,
+        "state": run.state.type.value,
+        "final": run.state.is_final(),
+        "updated": run.updated.isoformat() if run.updated else None,
+        "progress": progress,
+    }
+
+class _RunWatcher:
+    """
+    Run snapshots shared by every client following a run.
+
+    /status answers from a run's snapshot while it is younger than `ttl`
+    (finished runs: always) and otherwise refreshes it with one Prefect read,
+    shared by concurrent callers. /events subscribers share one poller per
+    run, every `interval`, which stops with the last subscriber or when the
+    run finishes. Snapshots not accessed for `idle` seconds are dropped; at
+    most `max_runs` are kept, the least recently used go first.
+    """
+    def __init__(self, interval: float, ttl: float, idle: float, max_runs: int):
+        self.interval, self.ttl, self.idle, self.max_runs = interval, ttl, idle, max_runs
+        self._latest: dict[str, dict] = {}
+        self._fetched: dict[str, float] = {}
+        self._seen: dict[str, float] = {}
+        self._subs: dict[str, set[asyncio.Queue]] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._refreshing: dict[str, asyncio.Future] = {}
+
+    async def get(self, flow_run_id: str) -> dict:
+        snap = self._latest.get(flow_run_id)
+        if snap is not None and (
+            snap["final"] or asyncio.get_running_loop().time() - self._fetched[flow_run_id] < self.ttl
+        ):
+            self._touch(flow_run_id)
+            return snap
+        return await self._refresh(flow_run_id)
+
+    async def subscribe(self, flow_run_id: str) -> AsyncIterator[dict]:
+        first = await self.get(flow_run_id)          # 404s early
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subs.setdefault(flow_run_id, set()).add(queue)
+        self._ensure_poller(flow_run_id)
         try:
-            dep = await client.read_deployment_by_name(DEPLOYMENT)
-        except ObjectNotFound:
-            raise HTTPException(404, f"Deployment '{DEPLOYMENT}' not found")
-        run = await client.create_flow_run_from_deployment(
-            dep.id,
-            parameters=req.model_dump(exclude_none=True),
-            name=f"api-{uuid.uuid4().hex[:6]}",
-        )
-    return {"flow_run_id": str(run.id), "state": run.state.type.value}
+            snap = first
+            yield snap
+            while not snap["final"]:
+                snap = await queue.get()
+                yield snap
+        finally:
+            subs = self._subs.get(flow_run_id)
+            if subs is not None:
+                subs.discard(queue)
+                if not subs:
+                    del self._subs[flow_run_id]
+            if flow_run_id in self._latest:
+                self._touch(flow_run_id)
+
+    async def _refresh(self, flow_run_id: str) -> dict:
+        fut = self._refreshing.get(flow_run_id)
+        if fut is None:
+            fut = self._refreshing[flow_run_id] = asyncio.ensure_future(_snapshot(flow_run_id))
+
+            def _done(f: asyncio.Future) -> None:
+                if self._refreshing.get(flow_run_id) is f:
+                    del self._refreshing[flow_run_id]
+                if not f.cancelled():
+                    f.exception()             # mark retrieved when every caller went away
+            fut.add_done_callback(_done)
+        snap = await asyncio.shield(fut)
+        self._store(flow_run_id, snap)
+        return snap
+
+    def _store(self, flow_run_id: str, snap: dict) -> None:
+        if snap != self._latest.get(flow_run_id):
+            for q in self._subs.get(flow_run_id, ()):
+                q.put_nowait(snap)
+        self._latest[flow_run_id] = snap
+        self._fetched[flow_run_id] = asyncio.get_running_loop().time()
+        self._touch(flow_run_id)
+
+    def _touch(self, flow_run_id: str) -> None:
+        # re-insert so dict order is least → most recently used, then drop
+        # unsubscribed runs that went idle or overflow max_runs
+        now = asyncio.get_running_loop().time()
+        self._seen.pop(flow_run_id, None)
+        self._seen[flow_run_id] = now
+        excess = len(self._seen) - self.max_runs
+        stale = []
+        for run, seen in self._seen.items():
+            if now - seen <= self.idle and excess <= 0:
+                break
+            if not self._subs.get(run):
+                stale.append(run)
+                excess -= 1
+        for run in stale:
+            self._evict(run)
+
+    def _evict(self, flow_run_id: str) -> None:
+        task = self._tasks.pop(flow_run_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        for d in (self._seen, self._subs, self._latest, self._fetched):
+            d.pop(flow_run_id, None)
+
+    def _ensure_poller(self, flow_run_id: str) -> None:
+        task = self._tasks.get(flow_run_id)
+        if task is None or task.done():
+            self._tasks[flow_run_id] = asyncio.create_task(self._poll(flow_run_id))
+
+    async def _poll(self, flow_run_id: str) -> None:
+        while self._subs.get(flow_run_id) and not self._latest.get(flow_run_id, {"final": True})["final"]:
+            await asyncio.sleep(self.interval)
+            if not self._subs.get(flow_run_id):
+                break
+            try:
+                await self._refresh(flow_run_id)
+            except (HTTPException, httpx.HTTPError):
+                pass
+        if self._tasks.get(flow_run_id) is asyncio.current_task():
+            del self._tasks[flow_run_id]
+
+    async def close(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+_WATCHER = _RunWatcher(STATUS_POLL_INTERVAL, STATUS_TTL, STATUS_WATCH_IDLE, STATUS_WATCH_MAX_RUNS)
 
 @app.get("/status/{flow_run_id}")
 async def status(flow_run_id: str):
-    async with get_client() as client:
+    snap = await _WATCHER.get(flow_run_id)
+    return {"state": snap["state"], "updated": snap["updated"], "progress": snap["progress"]}
+
+@app.get("/events/{flow_run_id}")
+async def events(flow_run_id: str):
+    stream = _WATCHER.subscribe(flow_run_id)
+    first = await stream.__anext__()      # surface 404 before the stream starts
+
+    async def _sse():
         try:
-            run = await client.read_flow_run(flow_run_id)
-        except ObjectNotFound:
-            raise HTTPException(404, f"Run '{flow_run_id}' not found")
-    return {"state": run.state.type.value, "updated": run.updated}
+            yield f"event: state\ndata: {json.dumps(first)}\n\n"
+            async for snap in stream:
+                yield f"event: state\ndata: {json.dumps(snap)}\n\n"
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(_sse(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+# Derived-catalog lookup: item id → visual COG href (reloaded when catalog.json changes)
+@lru_cache(maxsize=1)
+def _load_derived_cogs(mtime: float) -> dict[str, str]:
+    cat = pystac.Catalog.from_file(DERIVED_CATALOG_JSON)
+    return {
+        it.id: it.assets["visual"].get_absolute_href()
+        for it in cat.get_items(recursive=True)
+        if "visual" in it.assets
+    }
+
+def _derived_cogs() -> dict[str, str]:
+    try:
+        return _load_derived_cogs(os.stat(DERIVED_CATALOG_JSON).st_mtime)
+    except FileNotFoundError:
+        return {}
+
+@app.get("/tiles/{item_id}/{z}/{x}/{y}.png")
+async def tile(item_id: str, z: int, x: int, y: int, request: Request):
+    if not (0 <= z <= 24 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(400, f"Invalid tile {z}/{x}/{y}")
+    loop = asyncio.get_running_loop()
+    href = (await loop.run_in_executor(_TILE_POOL, _derived_cogs)).get(item_id)
+    if href is None:
+        raise HTTPException(404, f"Item '{item_id}' not in derived catalog")
+    try:
+        mtime = os.stat(href).st_mtime
+    except FileNotFoundError:
+        raise HTTPException(404, f"COG for '{item_id}' not found")
+
+    etag = '"' + hashlib.sha1(f"{href}:{mtime}:{z}/{x}/{y}".encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": TILE_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    png = await loop.run_in_executor(_TILE_POOL, cached_tile, href, mtime, z, x, y)
+    if png is None:                       # tile outside the COG footprint
+        return Response(status_code=204, headers=headers)
+    return Response(png, media_type="image/png", headers=headers)
@@ -27,6 +27,54 @@ DERIVED_CATALOG_DESCRIPTION = "Monthly RGB Composites"
 DERIVED_CATALOG_DIR         = os.path.join(DATA_DIR, 'catalog', 'derived')
 DERIVED_CATALOG_JSON        = os.path.join(DERIVED_CATALOG_DIR, 'catalog.json')
 
+# COG encoding profiles (GDAL COG driver creation options). "rescale" maps the
+# reflectance range to uint8 RGB + alpha for the lossy WEBP/JPEG codecs, which
+# need 8-bit input; nodata lives in the alpha band so lossy encoding can't blur it.
+COG_PROFILES = {
+    "default": {                 # previous behaviour, now multi-threaded
+        "compress": "DEFLATE",
+        "num_threads": "ALL_CPUS",
+    },
+    "fast-preview": {
+        "compress": "ZSTD", "level": 1, "predictor": "YES",
+        "blocksize": 256, "overview_resampling": "NEAREST",
+        "num_threads": "ALL_CPUS",
+    },
+    "archive": {
+        "compress": "ZSTD", "level": 15, "predictor": "YES",
+        "blocksize": 512, "overview_resampling": "AVERAGE",
+        "num_threads": "ALL_CPUS",
+    },
+    "web": {
+        "compress": "WEBP", "quality": 85,
+        "blocksize": 256, "overview_resampling": "AVERAGE",
+        "num_threads": "ALL_CPUS", "rescale": (0, 3000),
+    },
+}
+DEFAULT_COG_PROFILE = "default"
+
+# Zarr datacube sink (time/band/y/x). One month per time-chunk so appends
+# never rewrite existing chunks; y/x chunks are also the dask write regions.
+ZARR_DIR         = os.path.join(DATA_DIR, 'zarr')
+ZARR_CHUNKS      = {'time': 1, 'band': 3, 'y': 512, 'x': 512}
+ZARR_COMPRESSOR  = {'cname': 'zstd', 'clevel': 5}
+ZARR_MEDIA_TYPE  = "application/vnd+zarr"
+
+# Description of the table artifacts the flow publishes for stage progress
+# (read back by api.py /status and /events)
+PROGRESS_ARTIFACT = "eo-progress"
+
+# Fault-tolerant reads (utils/resilient_reader.py)
+# policy after retries: "nodata" fills the failed chunk, "quarantine" also drops
+# the scene from every later read, "raise" fails the compute as before
+READ_FAILURE_POLICIES = ("nodata", "quarantine", "raise")
+READ_FAILURE_POLICY   = "nodata"
+READ_RETRIES          = 3        # per-chunk retries on top of GDAL's own HTTP retries
+READ_BACKOFF          = 0.5      # seconds, doubled every attempt (+ jitter)
+GDAL_HTTP_MAX_RETRY   = 3
+GDAL_HTTP_RETRY_DELAY = 0.5
+REPORTS_DIR           = os.path.join(DATA_DIR, 'reports')
+
 # 4. Environment
 ENVIRONMENT = "development"
 
@@ -38,9 +86,14 @@ DEFAULT_TOI     = "2024-06-01/2024-06-30"
 ASSETS          = ["B04", "B03", "B02"]
 COMMON_ASSETS   = ["red", "green", "blue"]
 
-EPSG            = 32610
+EPSG            = 32610     # fallback only; the working CRS is chosen per AOI (AOI_CRS)
+# "utm": per-AOI UTM zone, preferring the zone most matched scenes are natively in,
+# or a fixed EPSG code for every AOI (e.g. 6933, WGS 84 / NSIDC EASE-Grid 2.0 equal-area)
+AOI_CRS         = "utm"
 RESOLUTION      = 100
 OUT_DIR         = "../output_data"
+SINKS           = ("cog", "zarr", "both")
+DEFAULT_SINK    = "cog"
 
 
 COLLECTION=["sentinel-2-l2a"]
@@ -32,4 +32,42 @@ DASK_CONFIG = {
 
 SUPPRESS_WARNINGS = True  # Control whether to suppress all warnings
 
-PREFECT_API_URL="http://127.0.0.1:4200/api"
\ No newline at end of file
+PREFECT_API_URL="http://127.0.0.1:4200/api"
+
+# Tile server configuration (api.py /tiles)
+TILE_SIZE = 256  # Web-mercator tile edge in pixels
+TILE_CACHE_SIZE = 2048  # Rendered PNG tiles kept in the in-memory LRU
+TILE_THREADS = min(32, (os.cpu_count() or 1) * 4)  # Thread pool for blocking raster reads
+TILE_RESCALE = (0, 3000)  # Reflectance range stretched to 0-255 for display
+TILE_CACHE_CONTROL = "public, max-age=3600"  # Derived COGs are immutable per month
+
+# Run coalescing (api.py /run)
+RUN_REUSE_TTL = 3600  # Seconds a completed run's outputs are reused for an identical request
+RUN_BATCH_WINDOW = 2.0  # Seconds small requests wait to be merged into one multi-bbox run
+RUN_BATCH_MAX_AREA = 0.25  # Max bbox area (deg²) for a request to count as "small"
+RUN_BATCH_MAX_BBOXES = 16  # Flush a batch early once it holds this many AOIs
+
+# Prefect client & progress streaming (api.py)
+PREFECT_MAX_CONNECTIONS = 32  # Pooled HTTP connections to the Prefect API for the app's lifetime
+STATUS_POLL_INTERVAL = 1.0  # Seconds between Prefect polls of a run with /events subscribers (one poller per run)
+STATUS_TTL = 2.0  # Seconds /status serves a run's cached snapshot before asking Prefect again
+STATUS_WATCH_IDLE = 30.0  # Seconds a run's snapshot stays cached after its last access
+STATUS_WATCH_MAX_RUNS = 1024  # Upper bound on cached run snapshots; least recently used are evicted
+
+# Memory-budget planner (pipeline/planner.py)
+PLANNER_MEMORY_FRACTION = 0.6  # Share of total worker memory a batch may use (below the 0.75 spill mark)
+PLANNER_OVERHEAD = 2.5  # Working-set multiplier over the raw stack (median copies + temporaries)
+PLANNER_DTYPE = "float64"  # stackstac's default output dtype
+PLANNER_CHUNKSIZE = 1024  # stackstac's default spatial chunk edge (pixels)
+
+# Persistent warm Dask cluster shared by Prefect flow runs (dask_cluster.py)
+DASK_SCHEDULER_ADDRESS = "tcp://127.0.0.1:8786"  # Flow attaches here when reachable
+DASK_DASHBOARD_ADDRESS = ":8787"
+DASK_WARM_IMPORTS = ["numpy", "xarray", "rioxarray", "rasterio", "stackstac", "pystac", "zarr",
+                     "pipeline.geo_tasks"]  # Imported once per worker at startup
+DASK_WARM_GDAL_ENV = {  # Process-wide GDAL config for COG reads over HTTP
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "GDAL_HTTP_MULTIPLEX": "YES",
+    "VSI_CACHE": "TRUE",
+}
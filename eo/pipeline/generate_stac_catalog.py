@@ -8,10 +8,14 @@ from typing import Sequence, Tuple
 import numpy as np
 import pystac
 from dask import delayed
+from filelock import FileLock
 from shapely.geometry import box
 
 from config.config import DERIVED_CATALOG_JSON, RAW_CATALOG_JSON, DERIVED_CATALOG_DESCRIPTION, DERIVED_CATALOG_ID, \
-    DERIVED_CATALOG_DIR, RAW_CATALOG_DESCRIPTION, RAW_CATALOG_ID, RAW_CATALOG_DIR, DATA_DIR
+    DERIVED_CATALOG_DIR, RAW_CATALOG_DESCRIPTION, RAW_CATALOG_ID, RAW_CATALOG_DIR, DATA_DIR, ZARR_MEDIA_TYPE
+from utils.bbox_to_h3 import bbox_to_h3
+
+PROJECTION_EXT = "https://stac-extensions.github.io/projection/v1.1.0/schema.json"
 
 
 def create_raw_catalog(
@@ -84,50 +88,86 @@ def create_derived_catalog(
     catalog_dir: str | Path = DERIVED_CATALOG_DIR,
     catalog_id: str = DERIVED_CATALOG_ID,
     title: str = DERIVED_CATALOG_DESCRIPTION,
+    zarr_store: str | Path | None = None,
+    months: Sequence[np.datetime64] | None = None,
 ) -> delayed:
     """
     Build & write a self-contained STAC Catalog of monthly COGs.
 
-    Expects COGs in ./data/derived_cogs/monthly_composite_<YYYY-MM>.tif
+    Every item records the composite's CRS as `proj:epsg`.
+
+    Months default to `monthly_rgb.time`; pass `months` instead when the
+    composites were written in several batches (monthly_rgb may then be None).
+
+    Expects COGs in ./data/cogs/monthly_rgb_<h3>_<YYYY-MM>.tif (as written by
+    save_monthly_cogs).
+    When `zarr_store` is given, every item also gets a `datacube` asset
+    pointing at the shared Zarr store (selected by the item's month).
     Returns the path to the catalog.json (uses DERIVED_CATALOG_JSON).
     """
     catalog_dir = Path(catalog_dir)
     geom = box(*aoi_bbox).__geo_interface__
+    aoi_id = bbox_to_h3(aoi_bbox, res=10)
 
     @delayed(pure=False)
     def _write() -> str:
-        catalog = pystac.Catalog(
-            id=catalog_id,
-            title=title,
-            description=title,
-            href=str(catalog_dir),
-        )
-
-        for ts in monthly_rgb.time.values:
-            month_str = np.datetime_as_string(ts, unit="M")
-            cog_filename = f"monthly_composite_{month_str}.tif"
-            cog_href = str(Path(DATA_DIR) / "cogs" / cog_filename)
-
-            item = pystac.Item(
-                id=f"{catalog_id}-{month_str}",
-                geometry=geom,
-                bbox=list(aoi_bbox),
-                datetime=np.datetime64(ts).astype("datetime64[ms]").tolist(),
-                properties={},
-            )
-            item.add_asset(
-                "visual",
-                pystac.Asset(
-                    href=cog_href,
-                    media_type=pystac.MediaType.COG,
-                    roles=["data", "visual"],
-                    title=f"RGB composite {month_str}",
-                ),
-            )
-            catalog.add_item(item)
-
-        catalog.normalize_hrefs(str(catalog_dir))
-        catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+        catalog_json = catalog_dir / "catalog.json"
+        catalog_dir.mkdir(parents=True, exist_ok=True)
+        with FileLock(f"{catalog_json}.lock"):
+            if catalog_json.exists():
+                catalog = pystac.Catalog.from_file(str(catalog_json))
+            else:
+                catalog = pystac.Catalog(
+                    id=catalog_id,
+                    title=title,
+                    description=title,
+                    href=str(catalog_dir),
+                )
+
+            for ts in (monthly_rgb.time.values if months is None else months):
+                month_str = np.datetime_as_string(ts, unit="M")
+                cog_filename = f"monthly_rgb_{aoi_id}_{month_str}.tif"
+                cog_href = str(Path(DATA_DIR) / "cogs" / cog_filename)
+                item_id = f"{catalog_id}-{aoi_id}-{month_str}"
+
+                item = pystac.Item(
+                    id=item_id,
+                    geometry=geom,
+                    bbox=list(aoi_bbox),
+                    datetime=np.datetime64(ts).astype("datetime64[ms]").tolist(),
+                    properties={"proj:epsg": int(epsg)},
+                    stac_extensions=[PROJECTION_EXT],
+                )
+                item.add_asset(
+                    "visual",
+                    pystac.Asset(
+                        href=cog_href,
+                        media_type=pystac.MediaType.COG,
+                        roles=["data", "visual"],
+                        title=f"RGB composite {month_str}",
+                    ),
+                )
+                previous = catalog.get_item(item_id)
+                if zarr_store is not None:
+                    item.add_asset(
+                        "datacube",
+                        pystac.Asset(
+                            href=str(zarr_store),
+                            media_type=ZARR_MEDIA_TYPE,
+                            roles=["data"],
+                            title="RGB datacube (time, band, y, x)",
+                            extra_fields={"xarray:open_kwargs": {"engine": "zarr", "consolidated": True}},
+                        ),
+                    )
+                elif previous is not None and "datacube" in previous.assets:
+                    # a COG-only re-run keeps the datacube written earlier
+                    item.add_asset("datacube", previous.assets["datacube"].clone())
+                if previous is not None:
+                    catalog.remove_item(item_id)
+                catalog.add_item(item)
+
+            catalog.normalize_hrefs(str(catalog_dir))
+            catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
         return DERIVED_CATALOG_JSON
 
     return _write()
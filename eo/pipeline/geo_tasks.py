@@ -7,22 +7,28 @@ orchestration tools later.
 from __future__ import annotations
 
 import logging
+from collections import Counter
 from pathlib import Path
 from typing import Sequence, Tuple, List, Any
 
+import numcodecs
 import numpy as np
 import pystac
 import xarray as xr
 import pystac_client
 import stackstac
 from dask import delayed
-from rasterio.enums import Resampling
+from rasterio.enums import ColorInterp, Resampling
+from rasterio.io import MemoryFile
+from rasterio.shutil import copy as rio_copy
 import rioxarray  # noqa: F401  – needed for the .rio accessor
 from dask.diagnostics import ProgressBar
 
-from config.config import EPSG, RESOLUTION, COLLECTION, DATA_DIR
+from config.config import EPSG, AOI_CRS, RESOLUTION, COG_PROFILES, DEFAULT_COG_PROFILE, COLLECTION, DATA_DIR, ZARR_DIR, ZARR_CHUNKS, ZARR_COMPRESSOR, \
+    READ_FAILURE_POLICY, GDAL_HTTP_MAX_RETRY, GDAL_HTTP_RETRY_DELAY
 from utils.bbox_to_h3 import bbox_to_h3
 from utils.fsspec_copy import _copy_file
+from utils.resilient_reader import make_reader, quarantined_urls
 
 logger = logging.getLogger(__name__)
 
@@ -66,20 +72,80 @@ def search_items(
     return items
 
 
-# 2. Stack assets into a Dask-backed xarray.DataArray
+# 2a. Pick the working CRS for an AOI
+def utm_epsg(lon: float, lat: float) -> int:
+    """WGS 84 / UTM EPSG code for a lon/lat point (326xx north, 327xx south)."""
+    zone = min(int((lon + 180) // 6) + 1, 60)
+    # Norway / Svalbard exceptions of the UTM grid
+    if 56 <= lat < 64 and 3 <= lon < 12:
+        zone = 32
+    elif 72 <= lat < 84 and 0 <= lon < 42:
+        zone = 31 if lon < 9 else 33 if lon < 21 else 35 if lon < 33 else 37
+    return (32600 if lat >= 0 else 32700) + zone
+
+
+def _native_epsg(item: pystac.Item) -> int | None:
+    props = item.properties
+    if props.get("proj:epsg"):
+        return int(props["proj:epsg"])
+    code = props.get("proj:code") or ""
+    return int(code.split(":")[1]) if code.upper().startswith("EPSG:") else None
+
+
+def aoi_epsg(
+    bbox: Tuple[float, float, float, float],
+    items: Sequence[pystac.Item] = (),
+    crs: str | int = AOI_CRS,
+) -> int:
+    """
+    EPSG code to stack an AOI in.
+
+    With ``crs="utm"`` the native UTM zone shared by most matched scenes wins,
+    so most reads skip reprojection; ties (or no projection metadata) fall
+    back to the zone of the AOI centre. Any other value is used as-is, e.g.
+    an equal-area CRS for AOIs spanning several zones.
+    """
+    if crs != "utm":
+        return int(crs)
+    minx, miny, maxx, maxy = bbox
+    centre = utm_epsg((minx + maxx) / 2, (miny + maxy) / 2)
+    native = Counter(e for e in map(_native_epsg, items) if e)
+    if not native:
+        return centre
+    best = max(native.values())
+    return centre if native.get(centre) == best else native.most_common(1)[0][0]
+
+
+# 2b. Stack assets into a Dask-backed xarray.DataArray
 def band_stack(
     items: Sequence[pystac.Item],
     bbox: Tuple[float, float, float, float],
-    epsg: int = EPSG,
+    epsg: int | None = None,
     assets: Sequence[str] = (),
     resolution: float = RESOLUTION,
     resampling: Resampling = Resampling.bilinear,
+    failure_report: str | Path | None = None,
+    failure_policy: str = READ_FAILURE_POLICY,
 ) -> xr.DataArray:
     """
     Convert an ItemCollection to a lazily-evaluated xarray stack.
 
-    The result dims are (time, band, y, x).
+    The result dims are (time, band, y, x), in `epsg` or, when omitted, the
+    per-AOI CRS from `aoi_epsg`.
+
+    Every chunk read is retried with backoff; reads that still fail are
+    handled per `failure_policy` and, if `failure_report` is given, appended
+    to it. Scenes already quarantined in that report are left out of the
+    stack. Without a report, failures are only logged and quarantine lasts
+    for the worker process.
     """
+    bad = quarantined_urls(failure_report) if failure_report else set()
+    if bad:
+        kept = [it for it in items if not any(a.href in bad for a in it.assets.values())]
+        logger.warning("Skipping %d quarantined scene(s)", len(items) - len(kept))
+        items = kept
+
+    epsg = epsg or aoi_epsg(bbox, items)
     stack = stackstac.stack(
         items,
         bounds_latlon=bbox,
@@ -87,6 +153,11 @@ def band_stack(
         assets=assets,
         resolution=resolution,
         resampling=resampling,
+        reader=make_reader(failure_report, policy=failure_policy),
+        gdal_env=stackstac.DEFAULT_GDAL_ENV.updated(always=dict(
+            GDAL_HTTP_MAX_RETRY=GDAL_HTTP_MAX_RETRY,
+            GDAL_HTTP_RETRY_DELAY=GDAL_HTTP_RETRY_DELAY,
+        )),
     )
     # Replace numeric band names with common names when available
 
@@ -111,14 +182,56 @@ def monthly_median_rgb(stack: xr.DataArray) -> xr.DataArray:
 
 
 # 4. Persist each monthly composite to disk as Cloud-Optimized GeoTIFF
+def write_cog(
+    da: xr.DataArray,
+    out_path: str | Path,
+    profile: str = DEFAULT_COG_PROFILE,
+    compress: str | None = None,
+) -> Path:
+    """
+    Encode one (band, y, x) array as a COG using a named entry of COG_PROFILES.
+
+    Profiles with a `rescale` range are stretched to uint8 RGB plus an alpha
+    band for nodata, so lossy codecs (WEBP/JPEG) can't blur the nodata edge;
+    `compress` overrides the profile's codec.
+    """
+    if profile not in COG_PROFILES:
+        raise ValueError(f"unknown COG profile {profile!r}; choose from {sorted(COG_PROFILES)}")
+    options = dict(COG_PROFILES[profile])
+    rescale = options.pop("rescale", None)
+    if compress:
+        options["compress"] = compress
+    if rescale is None:
+        da.rio.to_raster(out_path, driver="COG", **options)
+        return Path(out_path)
+
+    lo, hi = rescale
+    da = da.compute()                    # one pass over the (dask) composite for both arrays
+    valid = da.notnull().all("band").values
+    rgb = ((da - lo) * 255.0 / (hi - lo)).clip(0, 255).fillna(0).astype("uint8").values
+    alpha = np.where(valid, 255, 0).astype("uint8")
+    # the COG driver only supports CreateCopy: stage the RGBA in memory with
+    # alpha colour interpretation, then copy it out with the profile options
+    with MemoryFile() as mem:
+        with mem.open(driver="GTiff", width=rgb.shape[2], height=rgb.shape[1], count=4,
+                      dtype="uint8", crs=da.rio.crs, transform=da.rio.transform()) as tmp:
+            tmp.write(np.concatenate([rgb, alpha[None]]))
+            tmp.colorinterp = [ColorInterp.red, ColorInterp.green, ColorInterp.blue, ColorInterp.alpha]
+        with mem.open() as src:
+            rio_copy(src, str(out_path), driver="COG", **options)
+    return Path(out_path)
+
+
 def save_monthly_cogs(
     monthly_rgb: xr.DataArray,
     bbox: Any,
     out_dir: str | Path,
-    compress: str = "deflate",
+    compress: str | None = None,
+    profile: str = DEFAULT_COG_PROFILE,
 ) -> List[Path]:
     """
-    Write each monthly composite to `<out_dir>/monthly_rgb_<h3>_<YYYY-MM>.tif`.
+    Write each monthly composite to `<out_dir>/monthly_rgb_<h3>_<YYYY-MM>.tif`
+    with the given COG encoding profile (see COG_PROFILES).
 
     Returns the list of written file paths.
     """
@@ -132,12 +245,101 @@ def save_monthly_cogs(
             tstr = np.datetime_as_string(ts, unit="M")
             da = monthly_rgb.sel(time=ts).transpose("band", "y", "x")
             out_path = out_dir / f"monthly_rgb_{aoi_id}_{tstr}.tif"
-            da.rio.to_raster(out_path, driver="COG", compress=compress)
-            written.append(out_path)
+            written.append(write_cog(da, out_path, profile=profile, compress=compress))
 
     return written
 
 
+def zarr_store_path(bbox: Any) -> Path:
+    """Default Zarr datacube location for an AOI: `<ZARR_DIR>/monthly_rgb_<h3>.zarr`."""
+    return Path(ZARR_DIR) / f"monthly_rgb_{bbox_to_h3(bbox, res=10)}.zarr"
+
+
+# 4b. Persist the monthly composites into a single chunked Zarr datacube
+def save_monthly_zarr(
+    monthly_rgb: xr.DataArray,
+    bbox: Any,
+    store: str | Path | None = None,
+    chunks: dict = ZARR_CHUNKS,
+    compressor: dict = ZARR_COMPRESSOR,
+    compute: bool = True,
+) -> Path | delayed:
+    """
+    Write the composites to `<ZARR_DIR>/monthly_rgb_<h3>.zarr` with dims
+    (time, band, y, x).
+
+    Dask chunks are aligned 1:1 with the Zarr chunks, so every worker writes
+    its own region of the store without a lock. If the store already exists,
+    only months that are not yet in it are appended along `time`; existing
+    chunks are never rewritten (one month per time-chunk). Appending data on
+    a different grid (CRS, y/x coordinates or bands) raises ValueError.
+
+    With ``compute=False`` the write is returned as a delayed resolving to the
+    store path, so callers can compute it alongside other Phase 2 tasks.
+    """
+    store = Path(store) if store else zarr_store_path(bbox)
+    store.parent.mkdir(parents=True, exist_ok=True)
+
+    crs = monthly_rgb.rio.crs
+    da = (
+        monthly_rgb.transpose("time", "band", "y", "x")
+        .reset_coords(drop=True)           # stackstac per-scene coords aren't zarr-serialisable
+        .astype("float32")
+    )
+    da.attrs = {}
+    da = da.chunk({dim: chunks[dim] for dim in da.dims if dim in chunks})
+    ds = da.to_dataset(name="rgb").rio.write_crs(crs)
+    ds["band"] = ds.band.astype(str)
+
+    if (store / ".zmetadata").exists():
+        existing = xr.open_zarr(store)
+        _check_zarr_grid(existing, ds, store)
+        ds = ds.sel(time=~ds.time.isin(existing.time.values))
+        if ds.sizes["time"] == 0:
+            logger.info("Zarr store %s already holds every month", store)
+            return store if compute else delayed(store)
+        # grid matches: append only the time-dependent data, never rewrite y/x/band/spatial_ref
+        ds = ds.drop_vars(["y", "x", "band", "spatial_ref"], errors="ignore")
+        write = ds.to_zarr(store, mode="a", append_dim="time", zarr_format=2,
+                           consolidated=True, compute=False)
+        logger.info("Appending %d month(s) to %s", ds.sizes["time"], store)
+    else:
+        encoding = {
+            "rgb": {
+                "chunks": tuple(chunks[dim] for dim in ("time", "band", "y", "x")),
+                "compressor": numcodecs.Blosc(shuffle=numcodecs.Blosc.BITSHUFFLE, **compressor),
+            }
+        }
+        write = ds.to_zarr(store, mode="w-", encoding=encoding, zarr_format=2,
+                           consolidated=True, compute=False)
+        logger.info("Creating Zarr store %s with %d month(s)", store, ds.sizes["time"])
+
+    done = delayed(lambda _: store, pure=True)(write)
+    if not compute:
+        return done
+    with ProgressBar():
+        return done.compute()
+
+
+def _check_zarr_grid(existing: xr.Dataset, new: xr.Dataset, store: Path) -> None:
+    """Refuse to append composites whose grid differs from the store's."""
+    old_crs, new_crs = existing.rio.crs, new.rio.crs
+    if old_crs != new_crs:
+        raise ValueError(
+            f"Zarr store {store} is in {old_crs}, new composites are in {new_crs}; "
+            "write them to a separate store or pin AOI_CRS"
+        )
+    for dim in ("y", "x", "band"):
+        old, cur = existing[dim].values, new[dim].values
+        if old.shape != cur.shape or not (
+            np.array_equal(old, cur) if dim == "band" else np.allclose(old, cur)
+        ):
+            raise ValueError(
+                f"Zarr store {store} has a different {dim!r} axis "
+                f"({old.size} vs {cur.size} values); refusing to append"
+            )
+
+
 # 5. Download raw assets (optional)
 def download_raw_assets(
     items: List[pystac.Item],
@@ -2,22 +2,28 @@
 """
 Orchestrates the end-to-end flow using the reusable tasks in two phases:
 1) Download raw tiles and build the raw STAC catalog
-2) Build monthly RGB composites, COGs, and the derived STAC catalog
+2) Build monthly RGB composites, COGs, and the derived STAC catalog, in
+   (AOI, month) batches sized to the Dask cluster memory (see planner.py)
 """
 
 from __future__ import annotations
 
 import argparse
 import logging
+import time
 from pathlib import Path
 
 import dask
 
-from config.config import AOI_BBOX, DEFAULT_TOI, OUT_DIR, API_URL, RAW_CATALOG_DIR, COMMON_ASSETS, EPSG, RESOLUTION, \
-    DERIVED_CATALOG_DIR, DATA_DIR
+from config.config import AOI_BBOX, DEFAULT_TOI, OUT_DIR, API_URL, RAW_CATALOG_DIR, COMMON_ASSETS, RESOLUTION, \
+    DERIVED_CATALOG_DIR, DATA_DIR, SINKS, DEFAULT_SINK, READ_FAILURE_POLICIES, READ_FAILURE_POLICY, \
+    COG_PROFILES, DEFAULT_COG_PROFILE
 from pipeline import geo_tasks
 from pipeline.generate_stac_catalog import create_raw_catalog, create_derived_catalog
+from pipeline.planner import work_units, plan_batches, group_by_aoi
 from ray_dask_init import initialize_ray_and_dask
+from utils.bbox_to_h3 import bbox_to_h3
+from utils.resilient_reader import read_failure_report
 
 
 def _parse_args() -> argparse.Namespace:
@@ -36,6 +42,18 @@ def _parse_args() -> argparse.Namespace:
         "--out-dir", default=DATA_DIR,
         help="Where to write raw tiles, COGs, and catalogs"
     )
+    p.add_argument(
+        "--sink", choices=SINKS, default=DEFAULT_SINK,
+        help="Write monthly composites as COGs, a Zarr datacube, or both"
+    )
+    p.add_argument(
+        "--cog-profile", choices=sorted(COG_PROFILES), default=DEFAULT_COG_PROFILE,
+        help="COG encoding profile (codec, level, predictor, block size, overviews, threads)"
+    )
+    p.add_argument(
+        "--on-read-failure", choices=READ_FAILURE_POLICIES, default=READ_FAILURE_POLICY,
+        help="After per-chunk retries: fill with nodata, quarantine the scene, or raise"
+    )
     p.add_argument(
         "--debug", action="store_true",
         help="Verbose Dask/Ray logs"
@@ -73,40 +91,82 @@ def run(args: argparse.Namespace | None = None) -> list[Path]:
     print(" ", raw_cat_path)  # should equal RAW_CATALOG_JSON
 
     # ==== PHASE 2: Monthly COGs + Derived STAC catalog ====
-    # 3. Build lazy xarray stack and select RGB
-    stack = geo_tasks.band_stack(
-        items=items,
-        bbox=tuple(args.bbox),
-        epsg=EPSG,
-        assets=COMMON_ASSETS,
-        resolution=RESOLUTION,
-    ).sel(band=COMMON_ASSETS)
-
-    # 4. Compute monthly median RGB composites (lazy)
-    monthly_rgb = geo_tasks.monthly_median_rgb(stack)
-
-    # 5. Persist monthly composites as COGs
-    cogs_out = Path(args.out_dir)
-    cog_task = dask.delayed(geo_tasks.save_monthly_cogs)(
-        monthly_rgb=monthly_rgb,
-        bbox=tuple(args.bbox),
-        out_dir=cogs_out,
-    )
-
-    # 6. Build derived STAC catalog
+    # 3. Plan (AOI, month) units into batches that fit the cluster memory
+    bbox = tuple(args.bbox)
+    sink = getattr(args, "sink", DEFAULT_SINK)
+    failure_policy = getattr(args, "on_read_failure", READ_FAILURE_POLICY)
+    failure_report = Path(args.out_dir) / "reports" / \
+        f"failed_reads_{bbox_to_h3(bbox, res=10)}_{time.strftime('%Y%m%dT%H%M%S')}.jsonl"
+    epsg = geo_tasks.aoi_epsg(bbox, items)
+    print(f"Working CRS: EPSG:{epsg}")
+    batches = plan_batches(work_units([(bbox, items)]))
+    print(f"Phase 2 planned into {len(batches)} batch(es)")
+
+    cog_paths: list[Path] = []
+    zarr_path = None
+    months = []
+    for i, batch in enumerate(batches, 1):
+        ((_, batch_items),) = group_by_aoi(batch)
+
+        # 4. Build lazy xarray stack for this batch's months and select RGB
+        stack = geo_tasks.band_stack(
+            items=batch_items,
+            bbox=bbox,
+            epsg=epsg,
+            assets=COMMON_ASSETS,
+            resolution=RESOLUTION,
+            failure_report=failure_report,
+            failure_policy=failure_policy,
+        ).sel(band=COMMON_ASSETS)
+
+        # 5. Compute monthly median RGB composites (lazy)
+        monthly_rgb = geo_tasks.monthly_median_rgb(stack)
+
+        # 6. Persist monthly composites as COGs and/or a Zarr datacube
+        cogs_out = Path(args.out_dir)
+        cog_task = []
+        if sink in ("cog", "both"):
+            cog_task = dask.delayed(geo_tasks.save_monthly_cogs)(
+                monthly_rgb=monthly_rgb,
+                bbox=bbox,
+                out_dir=cogs_out,
+                profile=getattr(args, "cog_profile", DEFAULT_COG_PROFILE),
+            )
+        zarr_task = None
+        if sink in ("zarr", "both"):
+            zarr_task = geo_tasks.save_monthly_zarr(
+                monthly_rgb=monthly_rgb,
+                bbox=bbox,
+                store=geo_tasks.zarr_store_path(bbox),
+                compute=False,
+            )
+
+        # 7. Execute the batch; results are on disk before the next one starts
+        batch_cogs, zarr_path = dask.compute(cog_task, zarr_task)
+        cog_paths.extend(batch_cogs)
+        months.extend(monthly_rgb.time.values)
+        print(f"  batch {i}/{len(batches)}: {', '.join(u.month for u in batch)} written")
+
+    # 8. Build derived STAC catalog over every batch's months
     derived_catalog_task = create_derived_catalog(
-        monthly_rgb=monthly_rgb,
-        aoi_bbox=tuple(args.bbox),
-        epsg=EPSG,
+        monthly_rgb=None,
+        aoi_bbox=bbox,
+        epsg=epsg,
         catalog_dir=DERIVED_CATALOG_DIR,
+        zarr_store=zarr_path,
+        months=months,
     )
-
-    # 7. Execute Phase 2
-    cog_paths, derived_cat_path = dask.compute(cog_task, derived_catalog_task)
-    print("\nPhase 2 complete — monthly COGs and derived STAC catalog:")
-    print("Wrote monthly COGs:")
-    for p in cog_paths:
-        print("  ", p)
+    (derived_cat_path,) = dask.compute(derived_catalog_task)
+    print("\nPhase 2 complete — monthly composites and derived STAC catalog:")
+    if cog_paths:
+        print("Wrote monthly COGs:")
+        for p in cog_paths:
+            print("  ", p)
+    if zarr_path:
+        print("Zarr datacube:", zarr_path)
     print("Derived STAC catalog:", derived_cat_path)  # should equal DERIVED_CATALOG_JSON
+    failures = read_failure_report(failure_report)
+    if failures:
+        print(f"⚠️  {len(failures)} chunk read(s) failed ({failure_policy}), see {failure_report}")
 
-    return cog_paths
\ No newline at end of file
+    return cog_paths
@@ -0,0 +1,141 @@
+"""
+Memory-budget planner for the monthly composite pipeline.
+
+Splits a request into (AOI, month) work units, estimates the bytes each unit
+needs from its scene count, raster size, chunking and dtype, and packs units
+into batches that fit the Dask cluster's memory. Batches are executed one
+after another, each streaming its composites to disk before the next starts.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pystac
+from dask.utils import format_bytes, parse_bytes
+
+from config.config import RESOLUTION, COMMON_ASSETS
+from config.settings import DASK_MEMORY_LIMIT, DASK_NUM_WORKERS, PLANNER_MEMORY_FRACTION, PLANNER_OVERHEAD, \
+    PLANNER_DTYPE, PLANNER_CHUNKSIZE
+
+logger = logging.getLogger(__name__)
+
+Bbox = Tuple[float, float, float, float]
+
+
+@dataclass(frozen=True)
+class WorkUnit:
+    """One AOI for one calendar month, with the scenes that fall into it."""
+    bbox: Bbox
+    month: str                                   # YYYY-MM
+    items: Tuple[pystac.Item, ...] = field(repr=False)
+    est_bytes: int = 0
+
+
+def cluster_budget(
+    n_workers: int = DASK_NUM_WORKERS,
+    memory_limit: str | int = DASK_MEMORY_LIMIT,
+    fraction: float = PLANNER_MEMORY_FRACTION,
+) -> int:
+    """Bytes a single batch may occupy across the whole cluster."""
+    limit = parse_bytes(memory_limit) if isinstance(memory_limit, str) else memory_limit
+    return int(n_workers * limit * fraction)
+
+
+def aoi_pixels(bbox: Bbox, resolution: float = RESOLUTION) -> Tuple[int, int]:
+    """Approximate (ny, nx) of the AOI at `resolution` metres (equirectangular)."""
+    minx, miny, maxx, maxy = bbox
+    mid_lat = math.radians((miny + maxy) / 2)
+    width_m = (maxx - minx) * 111_320 * math.cos(mid_lat)
+    height_m = (maxy - miny) * 110_540
+    return max(1, math.ceil(height_m / resolution)), max(1, math.ceil(width_m / resolution))
+
+
+def estimate_unit_bytes(
+    n_scenes: int,
+    bbox: Bbox,
+    n_bands: int = len(COMMON_ASSETS),
+    resolution: float = RESOLUTION,
+    dtype: str = PLANNER_DTYPE,
+    chunksize: int = PLANNER_CHUNKSIZE,
+    overhead: float = PLANNER_OVERHEAD,
+) -> int:
+    """
+    Peak bytes to composite one (AOI, month) unit.
+
+    The monthly median needs every scene of the month for a pixel, so the
+    working set is the full (time, band, y, x) stack times `overhead`, plus
+    the float32 composite. It never drops below one stackstac chunk across
+    all scenes, which is what a single task holds at once.
+    """
+    ny, nx = aoi_pixels(bbox, resolution)
+    itemsize = np.dtype(dtype).itemsize
+    stack = n_scenes * n_bands * ny * nx * itemsize
+    chunk = n_scenes * n_bands * min(ny, chunksize) * min(nx, chunksize) * itemsize
+    out = n_bands * ny * nx * np.dtype("float32").itemsize
+    return int(max(stack * overhead, chunk) + out)
+
+
+def work_units(
+    items_by_bbox: Iterable[Tuple[Bbox, Sequence[pystac.Item]]],
+    n_bands: int = len(COMMON_ASSETS),
+    resolution: float = RESOLUTION,
+) -> List[WorkUnit]:
+    """Split each AOI's scenes by calendar month, ordered by (AOI, month)."""
+    units: List[WorkUnit] = []
+    for bbox, items in items_by_bbox:
+        by_month: dict[str, list[pystac.Item]] = defaultdict(list)
+        for it in items:
+            by_month[it.datetime.strftime("%Y-%m")].append(it)
+        for month in sorted(by_month):
+            scenes = tuple(by_month[month])
+            units.append(WorkUnit(
+                bbox=tuple(bbox),
+                month=month,
+                items=scenes,
+                est_bytes=estimate_unit_bytes(len(scenes), bbox, n_bands, resolution),
+            ))
+    return units
+
+
+def plan_batches(units: Sequence[WorkUnit], budget: int | None = None) -> List[List[WorkUnit]]:
+    """
+    Greedily pack units, in order, into batches whose estimates sum to at most
+    `budget`. Order is kept so each AOI's months are written (and Zarr-appended)
+    chronologically. A unit larger than the budget runs alone.
+    """
+    budget = budget or cluster_budget()
+    batches: List[List[WorkUnit]] = []
+    current: List[WorkUnit] = []
+    used = 0
+    for unit in units:
+        if unit.est_bytes > budget:
+            logger.warning("%s %s needs ~%s, over the %s budget; running it alone",
+                           unit.bbox, unit.month, format_bytes(unit.est_bytes), format_bytes(budget))
+        if current and used + unit.est_bytes > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(unit)
+        used += unit.est_bytes
+    if current:
+        batches.append(current)
+
+    logger.info("Planned %d unit(s) into %d batch(es) under %s",
+                len(units), len(batches), format_bytes(budget))
+    return batches
+
+
+def group_by_aoi(batch: Sequence[WorkUnit]) -> List[Tuple[Bbox, List[pystac.Item]]]:
+    """
+    Merge a batch's units per AOI, so each AOI gets one stack (and one Zarr
+    append) per batch instead of one per month.
+    """
+    return [
+        (bbox, [it for unit in units for it in unit.items])
+        for bbox, units in groupby(batch, key=lambda u: u.bbox)
+    ]
@@ -1,22 +1,80 @@
 # sentinel2_parallel.py  (deployment via .serve())
+import datetime as dt
+import time
+from collections import defaultdict
 from pathlib import Path
 from typing import List, Tuple
 
 import dask
+import numpy as np
+from distributed import worker_client
 from prefect import flow, task
+from prefect.artifacts import create_table_artifact
+from prefect.context import FlowRunContext
 from prefect.logging import get_run_logger
+from prefect.runtime import flow_run
 from prefect_dask.task_runners import DaskTaskRunner
 
-from config.config import DATA_DIR, RESOLUTION, EPSG, API_URL, DERIVED_CATALOG_DIR, RAW_CATALOG_DIR
+from config.settings import DASK_SCHEDULER_ADDRESS, DASK_NUM_WORKERS, DASK_WORKER_THREADS, DASK_MEMORY_LIMIT, \
+    DASK_SPILL_DIR, DASK_CONFIG
+from config.config import DATA_DIR, RESOLUTION, API_URL, DERIVED_CATALOG_DIR, RAW_CATALOG_DIR, DEFAULT_SINK, \
+    PROGRESS_ARTIFACT, READ_FAILURE_POLICY, REPORTS_DIR, DEFAULT_COG_PROFILE
 from pipeline import geo_tasks
 from pipeline.generate_stac_catalog import create_derived_catalog, create_raw_catalog
+from pipeline.planner import work_units, plan_batches, group_by_aoi
+from utils.resilient_reader import read_failure_report
+from dask_cluster import scheduler_reachable
+
+
+class WarmDaskTaskRunner(DaskTaskRunner):
+    """
+    DaskTaskRunner that picks its cluster when each flow run starts: the
+    persistent warm cluster (python -m dask_cluster) if its scheduler answers,
+    otherwise a per-run LocalCluster with the same worker settings and
+    DASK_CONFIG (spill thresholds the planner budgets against).
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault("cluster_kwargs", {
+            "n_workers": DASK_NUM_WORKERS,
+            "threads_per_worker": DASK_WORKER_THREADS,
+            "memory_limit": DASK_MEMORY_LIMIT,
+            "local_directory": DASK_SPILL_DIR,
+        })
+        super().__init__(**kwargs)
+
+    def duplicate(self):
+        # never carry over an address chosen for a previous run
+        return type(self)(cluster_kwargs=self.cluster_kwargs, client_kwargs=self.client_kwargs)
+
+    def __enter__(self):
+        super().__enter__()
+        t0 = time.perf_counter()
+        if scheduler_reachable(DASK_SCHEDULER_ADDRESS):
+            self.address = DASK_SCHEDULER_ADDRESS
+        else:
+            self.address = None
+            self.logger.warning(f"No Dask scheduler at {DASK_SCHEDULER_ADDRESS}; starting a per-run cluster")
+            self._exit_stack.enter_context(dask.config.set(DASK_CONFIG))
+        self.client                      # connect now, so the attach is what gets timed
+        self.attach_s = time.perf_counter() - t0
+        return self
+
+
+def _progress(stage: str, bbox=None, **fields) -> None:
+    """Publish a stage-progress row; the API streams these to /events subscribers."""
+    create_table_artifact(
+        table=[{"stage": stage, "bbox": list(bbox) if bbox else None, **fields}],
+        description=PROGRESS_ARTIFACT,
+    )
 
 
 @task(retries=2, log_prints=True)
 def stac_search(api_url, bbox, toi):
     logger = get_run_logger()
     logger.info(f"STAC search {bbox} {toi}")
-    return geo_tasks.search_items(api_url, bbox, toi)
+    items = geo_tasks.search_items(api_url, bbox, toi)
+    _progress("scenes_matched", bbox, count=len(items))
+    return items
 
 
 @task
@@ -30,15 +88,17 @@ def build_raw_catalog(items, bbox):
         aoi_bbox=bbox,
         catalog_dir=RAW_CATALOG_DIR,
     )
-    # run on the Dask cluster
-    (path,) = dask.compute(task)
-    return path
+    # run on the Dask cluster through a worker client: the thread secedes
+    # while it waits, so blocked tasks can't starve the pool (no nested scheduler)
+    with worker_client() as client:
+        return client.compute(task).result()
 
 
 @task(retries=2)
-def band_stack(items, bbox, bands):
-    return geo_tasks.band_stack(items, bbox=bbox, epsg=EPSG,
-                                assets=bands, resolution=RESOLUTION)
+def band_stack(items, bbox, bands, epsg, failure_report=None, failure_policy=READ_FAILURE_POLICY):
+    return geo_tasks.band_stack(items, bbox=bbox, epsg=epsg,
+                                assets=bands, resolution=RESOLUTION,
+                                failure_report=failure_report, failure_policy=failure_policy)
 
 
 @task
@@ -47,7 +107,7 @@ def composite(xarr):
 
 
 @task
-def build_derived_catalog(monthly_rgb, bbox):
+def build_derived_catalog(monthly_rgb, bbox, epsg, zarr_store=None, months=None):
     """
     Submits the create_derived_catalog delayed task and computes it.
     Returns the path to catalog.json.
@@ -55,48 +115,102 @@ def build_derived_catalog(monthly_rgb, bbox):
     task = create_derived_catalog(
         monthly_rgb=monthly_rgb,
         aoi_bbox=bbox,
-        epsg=EPSG,
+        epsg=epsg,
         catalog_dir=DERIVED_CATALOG_DIR,
+        zarr_store=zarr_store,
+        months=months,
     )
-    (path,) = dask.compute(task)
-    return path
+    with worker_client() as client:
+        return client.compute(task).result()
 
 
 @task(log_prints=True)
-def write_cogs(rgb, bbox) -> List[Path]:
+def write_cogs(rgb, bbox, profile=DEFAULT_COG_PROFILE) -> List[Path]:
     logger = get_run_logger()
-    files = geo_tasks.save_monthly_cogs(rgb, bbox=bbox, out_dir=DATA_DIR)
+    with worker_client():            # chunk reads/encodes fan out over the cluster
+        files = geo_tasks.save_monthly_cogs(rgb, bbox=bbox, out_dir=DATA_DIR, profile=profile)
     logger.info(f"wrote {len(files)} → {DATA_DIR}")
+    _progress("months_written", bbox, sink="cog", count=len(files))
     return files
 
 
+@task(log_prints=True)
+def write_zarr(rgb, bbox) -> Path:
+    logger = get_run_logger()
+    with worker_client():            # region writes fan out over the cluster
+        store = geo_tasks.save_monthly_zarr(rgb, bbox=bbox)
+    logger.info(f"wrote {rgb.sizes['time']} month(s) → {store}")
+    _progress("months_written", bbox, sink="zarr", count=int(rgb.sizes["time"]))
+    return store
+
+
 # flow
-@flow(name="eo_monthly_mosaic",
-      task_runner=DaskTaskRunner(cluster_kwargs={"n_workers": 4, "threads_per_worker": 2}))
+@flow(name="eo_monthly_mosaic", task_runner=WarmDaskTaskRunner())
 def sentinel2_parallel(
         bboxes: List[Tuple[float, float, float, float]],
         toi: str,
         bands: List[str],
+        sink: str = DEFAULT_SINK,
+        read_failure_policy: str = READ_FAILURE_POLICY,
+        cog_profile: str = DEFAULT_COG_PROFILE,
 ):
-    futures = []
-    for bbox in bboxes:
-        items = stac_search.submit(API_URL, bbox, toi)
-        raw_cat = build_raw_catalog.submit(items, bbox)
-        stk = band_stack.submit(items, bbox, bands)
-        rgb = composite.submit(stk)
-        cogs = write_cogs.submit(rgb, bbox)
-        derived_cat = build_derived_catalog.submit(rgb, bbox)
-
-        futures.append({"raw_catalog": raw_cat,
-                        "cogs": cogs,
-                        "derived_catalog": derived_cat})
+    # per-run startup overhead: attaching to (or starting) the Dask cluster;
+    # the rest of the wait since scheduling is .serve() polling and queueing
+    attach_s = FlowRunContext.get().task_runner.attach_s
+    waited_s = (dt.datetime.now(dt.timezone.utc) - flow_run.scheduled_start_time).total_seconds()
+    queued_s = max(waited_s - attach_s, 0.0)
+    get_run_logger().info(f"startup overhead {attach_s:.1f}s (cluster attach), queued {queued_s:.1f}s")
+    _progress("startup", seconds=round(attach_s, 2), queued_seconds=round(queued_s, 2))
+
+    bboxes = [tuple(b) for b in bboxes]
+    failure_report = Path(REPORTS_DIR) / f"failed_reads_{flow_run.id}.jsonl"
+    searches = {bbox: stac_search.submit(API_URL, bbox, toi) for bbox in bboxes}
+    raw_cats = {bbox: build_raw_catalog.submit(items, bbox) for bbox, items in searches.items()}
+
+    # (AOI, month) units packed into batches that fit the cluster memory
+    items_by_bbox = {bbox: f.result() for bbox, f in searches.items()}
+    epsgs = {bbox: geo_tasks.aoi_epsg(bbox, items) for bbox, items in items_by_bbox.items()}
+    units = work_units(items_by_bbox.items(), n_bands=len(bands))
+    batches = plan_batches(units)
+    get_run_logger().info(f"{len(units)} (AOI, month) unit(s) in {len(batches)} batch(es)")
+
+    cogs, zarrs, months = defaultdict(list), {}, defaultdict(list)
+    for batch in batches:
+        pending = []
+        for bbox, batch_items in group_by_aoi(batch):
+            stk = band_stack.submit(batch_items, bbox, bands, epsgs[bbox], failure_report, read_failure_policy)
+            rgb = composite.submit(stk)
+            pending.append((
+                bbox,
+                write_cogs.submit(rgb, bbox, cog_profile) if sink in ("cog", "both") else None,
+                write_zarr.submit(rgb, bbox) if sink in ("zarr", "both") else None,
+            ))
+        # wait for the batch to land on disk before scheduling the next one
+        for bbox, c, z in pending:
+            if c is not None:
+                cogs[bbox].extend(c.result())
+            if z is not None:
+                zarrs[bbox] = z.result()
+        for unit in batch:
+            months[unit.bbox].append(np.datetime64(unit.month))
+
+    derived = {
+        bbox: build_derived_catalog.submit(None, bbox, epsgs[bbox], zarrs.get(bbox), months[bbox])
+        for bbox in bboxes
+    }
+    failures = read_failure_report(failure_report)
+    if failures:
+        get_run_logger().warning(f"{len(failures)} chunk read(s) failed ({read_failure_policy}) → {failure_report}")
     return [
         {
-            "raw_catalog": r["raw_catalog"].result(),
-            "cogs": r["cogs"].result(),
-            "derived_catalog": r["derived_catalog"].result(),
+            "raw_catalog": raw_cats[bbox].result(),
+            "cogs": cogs[bbox],
+            "zarr": zarrs.get(bbox),
+            "epsg": epsgs[bbox],
+            "derived_catalog": derived[bbox].result(),
+            "failed_reads": str(failure_report) if failures else None,
         }
-        for r in futures
+        for bbox in bboxes
     ]
 
 
@@ -0,0 +1,94 @@
+"""
+Benchmark the COG encoding profiles on synthetic monthly RGB composites.
+
+    python -m scripts.bench_cog_profiles --size 4096 --repeat 3
+
+Reports, per profile, the best-of-N encode time and the file size relative to
+the raw float32 array, using the same write_cog path as the pipeline.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import xarray as xr
+import rioxarray  # noqa: F401  – needed for the .rio accessor
+
+from config.config import COG_PROFILES, EPSG, RESOLUTION
+from pipeline.geo_tasks import write_cog
+
+
+def synthetic_composite(size: int, seed: int = 0) -> xr.DataArray:
+    """
+    A (band, y, x) float32 reflectance-like composite: smooth large-scale
+    structure plus sensor noise, with a NaN hole standing in for nodata.
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size] / size
+    bands = []
+    for base in (900, 1100, 1300):               # red, green, blue-ish levels
+        field = base
+        for _ in range(6):
+            fx, fy, phase = rng.uniform(1, 12), rng.uniform(1, 12), rng.uniform(0, 2 * np.pi)
+            field = field + rng.uniform(100, 400) * np.sin(2 * np.pi * (fx * xx + fy * yy) + phase)
+        bands.append(field + rng.normal(0, 30, (size, size)))
+    data = np.clip(np.stack(bands), 0, 10000).astype("float32")
+    data[:, : size // 8, : size // 8] = np.nan
+
+    x0, y0 = 500_000.0, 4_200_000.0
+    da = xr.DataArray(
+        data,
+        dims=("band", "y", "x"),
+        coords={
+            "band": ["red", "green", "blue"],
+            "y": y0 - (np.arange(size) + 0.5) * RESOLUTION,
+            "x": x0 + (np.arange(size) + 0.5) * RESOLUTION,
+        },
+    )
+    return da.rio.write_crs(f"EPSG:{EPSG}").rio.write_nodata(np.nan)
+
+
+def bench(size: int, repeat: int, profiles: list[str]) -> list[dict]:
+    da = synthetic_composite(size)
+    raw = da.nbytes
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in profiles:
+            out = Path(tmp) / f"{name}.tif"
+            times = []
+            for _ in range(repeat):
+                out.unlink(missing_ok=True)
+                t0 = time.perf_counter()
+                write_cog(da, out, profile=name)
+                times.append(time.perf_counter() - t0)
+            size_b = out.stat().st_size
+            rows.append({
+                "profile": name,
+                "codec": COG_PROFILES[name]["compress"],
+                "seconds": min(times),
+                "mb": size_b / 2 ** 20,
+                "ratio": raw / size_b,
+            })
+    return rows
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="COG encoding profile benchmark")
+    p.add_argument("--size", type=int, default=2048, help="Composite edge length in pixels")
+    p.add_argument("--repeat", type=int, default=3, help="Encodes per profile (best is reported)")
+    p.add_argument("--profiles", nargs="+", choices=sorted(COG_PROFILES), default=list(COG_PROFILES))
+    args = p.parse_args()
+
+    rows = bench(args.size, args.repeat, args.profiles)
+    print(f"synthetic composite 3×{args.size}×{args.size} float32 "
+          f"({3 * args.size ** 2 * 4 / 2 ** 20:.1f} MB raw)")
+    print(f"{'profile':<14}{'codec':<8}{'encode s':>10}{'size MB':>10}{'ratio':>8}")
+    for r in rows:
+        print(f"{r['profile']:<14}{r['codec']:<8}{r['seconds']:>10.2f}{r['mb']:>10.1f}{r['ratio']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
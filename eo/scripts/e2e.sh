@@ -9,14 +9,14 @@ SLEEP=${SLEEP:-5}
 mkdir -p "$LOG_DIR"
 
 # 1) Start Prefect server (background)
-echo "[1/5] Starting Prefect server…"
+echo "[1/6] Starting Prefect server…"
 nohup prefect server start \
     > "$LOG_DIR/prefect_server.log" 2>&1 &
 PREFECT_PID=$!
 echo "    → PID $PREFECT_PID, logs → $LOG_DIR/prefect_server.log"
 
 # 2) Wait for Prefect API
-echo -n "[2/5] Waiting for Prefect API at ${PREFECT_API_URL}"
+echo -n "[2/6] Waiting for Prefect API at ${PREFECT_API_URL}"
 tries=1
 until curl -sSf "${PREFECT_API_URL}" > /dev/null; do
   if [ "$tries" -ge "$MAX_TRIES" ]; then
@@ -29,15 +29,31 @@ until curl -sSf "${PREFECT_API_URL}" > /dev/null; do
 done
 echo " ✅"
 
-# 3) Launch Prefect flow (background)
-echo "[3/5] Launching Prefect flow (eo_monthly_mosaic)…"
+# 3) Start the persistent, pre-warmed Dask cluster shared by all flow runs
+echo "[3/6] Starting warm Dask cluster…"
+nohup poetry run python -m dask_cluster \
+    > "$LOG_DIR/dask_cluster.log" 2>&1 &
+DASK_PID=$!
+echo "    → PID $DASK_PID, logs → $LOG_DIR/dask_cluster.log"
+tries=1
+until poetry run python -c "import sys, dask_cluster; sys.exit(not dask_cluster.scheduler_reachable())"; do
+  if [ "$tries" -ge "$MAX_TRIES" ]; then
+    echo "    → not up yet; flow runs start a per-run cluster until it answers"
+    break
+  fi
+  sleep "$SLEEP"
+  tries=$((tries+1))
+done
+
+# 4) Launch Prefect flow (background)
+echo "[4/6] Launching Prefect flow (eo_monthly_mosaic)…"
 nohup poetry run python -m prefect_dag.eo_monthly_mosaic \
     > "$LOG_DIR/flow.log" 2>&1 &
 FLOW_PID=$!
 echo "    → PID $FLOW_PID, logs → $LOG_DIR/flow.log"
 
-# 4) Free up the FastAPI port if already in use
-echo "[4/5] Checking port ${FASTAPI_PORT} for existing process…"
+# 5) Free up the FastAPI port if already in use
+echo "[5/6] Checking port ${FASTAPI_PORT} for existing process…"
 if lsof -i tcp:"${FASTAPI_PORT}" -sTCP:LISTEN -t >/dev/null; then
   EXISTING=$(lsof -i tcp:"${FASTAPI_PORT}" -sTCP:LISTEN -t)
   echo "    → Port ${FASTAPI_PORT} in use by PID(s): ${EXISTING}. Killing…"
@@ -47,8 +63,8 @@ else
   echo "    → Port ${FASTAPI_PORT} is free"
 fi
 
-# 5) Launch FastAPI in the foreground
-echo "[5/5] Starting FastAPI at http://${FASTAPI_HOST}:${FASTAPI_PORT}…"
+# 6) Launch FastAPI in the foreground
+echo "[6/6] Starting FastAPI at http://${FASTAPI_HOST}:${FASTAPI_PORT}…"
 echo "    + poetry run uvicorn api:app --host ${FASTAPI_HOST} --port ${FASTAPI_PORT} --reload"
 exec poetry run uvicorn api:app \
     --host "${FASTAPI_HOST}" \
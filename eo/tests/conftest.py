@@ -0,0 +1,51 @@
+import math
+
+import numpy as np
+import pytest
+from rasterio.enums import ColorInterp
+from rasterio.io import MemoryFile
+from rasterio.shutil import copy as rio_copy
+from rasterio.transform import from_origin
+from rasterio.warp import transform
+
+# 2.56 km square of 10 m pixels in UTM 10N, around San Francisco
+UTM_ORIGIN = (550_000.0, 4_180_000.0)
+UTM_EPSG = 32610
+
+
+def lonlat_tile(lon: float, lat: float, z: int):
+    """XYZ tile containing lon/lat."""
+    n = 2 ** z
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return x, y
+
+
+@pytest.fixture
+def write_test_cog(tmp_path):
+    """Write a (bands, y, x) array as a COG on the UTM_ORIGIN grid."""
+
+    def write(data: np.ndarray, name: str = "rgb.tif", nodata=None, alpha: bool = False) -> str:
+        count, height, width = data.shape
+        profile = dict(
+            driver="GTiff", count=count, height=height, width=width, dtype=data.dtype,
+            crs=f"EPSG:{UTM_EPSG}", transform=from_origin(*UTM_ORIGIN, 10, 10), nodata=nodata,
+        )
+        out = tmp_path / name
+        with MemoryFile() as mem:
+            with mem.open(**profile) as dst:
+                dst.write(data)
+                if alpha:
+                    dst.colorinterp = [ColorInterp.red, ColorInterp.green, ColorInterp.blue, ColorInterp.alpha]
+            with mem.open() as src:
+                rio_copy(src, out, driver="COG")
+        return str(out)
+
+    return write
+
+
+@pytest.fixture
+def cog_centre():
+    """lon/lat of the test COG's centre."""
+    xs, ys = transform(f"EPSG:{UTM_EPSG}", "EPSG:4326", [UTM_ORIGIN[0] + 1280], [UTM_ORIGIN[1] - 1280])
+    return xs[0], ys[0]
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("prefect")
+
+import httpx  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def api():
+    # api builds its band catalog from the STAC endpoints at import; keep it offline
+    def offline(self, url, *args, **kwargs):
+        raise httpx.ConnectError("offline", request=httpx.Request("GET", url))
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(httpx.Client, "get", offline)
+        import api
+    return api
+
+
+def _request(api, **overrides):
+    fields = dict(
+        bboxes=[(-122.6, 37.5, -122.3, 37.9), (2.2, 48.8, 2.5, 49.0)],
+        toi="2024-06-01/2024-06-30",
+        bands=["red", "nir"],
+    )
+    fields.update(overrides)
+    return api.RunRequest(**fields)
+
+
+def test_request_key_ignores_bbox_and_band_order(api):
+    key = api._request_key(_request(api))
+    assert key == api._request_key(_request(
+        api,
+        bboxes=[(2.2, 48.8, 2.5, 49.0), (-122.6, 37.5, -122.3, 37.9)],
+        bands=["NIR", "red"],
+    ))
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"toi": "2024-07-01/2024-07-31"},
+        {"bands": ["red", "green"]},
+        {"bboxes": [(-122.6, 37.5, -122.3, 37.9)]},
+        {"sink": "zarr"},
+        {"out_dir": "/tmp/other"},
+    ],
+)
+def test_request_key_changes_with_request(api, overrides):
+    assert api._request_key(_request(api)) != api._request_key(_request(api, **overrides))
+
+
+def _snapshots(api, monkeypatch, states):
+    """Stub api._snapshot to walk through `states`, counting Prefect reads."""
+    calls = []
+
+    async def snapshot(flow_run_id):
+        await asyncio.sleep(0.01)
+        calls.append(flow_run_id)
+        state = states[min(len(calls), len(states)) - 1]
+        return {"flow_run_id": flow_run_id, "state": state, "final": state == "COMPLETED",
+                "updated": None, "progress": []}
+
+    monkeypatch.setattr(api, "_snapshot", snapshot)
+    return calls
+
+
+def test_status_reads_prefect_once_per_ttl_without_pollers(api, monkeypatch):
+    calls = _snapshots(api, monkeypatch, ["RUNNING"])
+
+    async def main():
+        watcher = api._RunWatcher(interval=0.01, ttl=60, idle=60, max_runs=8)
+        await asyncio.gather(*(watcher.get("r1") for _ in range(5)))    # concurrent callers share a read
+        await watcher.get("r1")
+        assert watcher._tasks == {}
+        watcher.ttl = 0
+        await watcher.get("r1")
+
+    asyncio.run(main())
+    assert calls == ["r1", "r1"]
+
+
+def test_events_poller_lives_with_subscribers(api, monkeypatch):
+    calls = _snapshots(api, monkeypatch, ["RUNNING", "RUNNING", "COMPLETED"])
+
+    async def main():
+        watcher = api._RunWatcher(interval=0.01, ttl=60, idle=60, max_runs=8)
+        states = [snap["state"] async for snap in watcher.subscribe("r1")]
+        await asyncio.sleep(0.05)
+        return watcher, states
+
+    watcher, states = asyncio.run(main())
+    assert states == ["RUNNING", "COMPLETED"]
+    assert len(calls) == 3 and watcher._tasks == {} and watcher._subs == {}
+
+
+def test_watcher_evicts_least_recently_used(api, monkeypatch):
+    _snapshots(api, monkeypatch, ["RUNNING"])
+
+    async def main():
+        watcher = api._RunWatcher(interval=0.01, ttl=60, idle=60, max_runs=2)
+        for run in ("r1", "r2", "r1", "r3"):
+            await watcher.get(run)
+        return watcher
+
+    assert list(asyncio.run(main())._latest) == ["r1", "r3"]
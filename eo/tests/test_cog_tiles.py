@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from rasterio.io import MemoryFile
+
+from conftest import lonlat_tile
+from utils.cog_tiles import render_tile, tile_bounds
+
+
+def _decode(png: bytes) -> np.ndarray:
+    with MemoryFile(png) as mem, mem.open() as src:
+        return src.read()
+
+
+def test_tile_bounds():
+    assert tile_bounds(0, 0, 0) == pytest.approx((-20037508.34, -20037508.34, 20037508.34, 20037508.34))
+    minx, miny, maxx, maxy = tile_bounds(1, 1, 0)
+    assert (minx, miny) == pytest.approx((0, 0))
+    assert maxx == pytest.approx(20037508.34) and maxy == pytest.approx(20037508.34)
+
+
+def test_render_tile_outside_cog(write_test_cog):
+    path = write_test_cog(np.full((3, 256, 256), 1500, dtype="float32"))
+    assert render_tile(path, 12, *lonlat_tile(2.35, 48.85, 12)) is None
+
+
+def test_render_float_cog(write_test_cog, cog_centre):
+    data = np.full((3, 256, 256), 1500, dtype="float32")
+    data[:, :64, :64] = np.nan
+    path = write_test_cog(data, nodata=np.nan)
+
+    z = 13                                   # tile wider than the COG
+    png = _decode(render_tile(path, z, *lonlat_tile(*cog_centre, z)))
+    assert png.shape == (4, 256, 256) and png.dtype == np.uint8
+
+    rgb, alpha = png[:3], png[3]
+    inside = alpha == 255
+    assert inside.any() and (alpha == 0).any()             # outside the footprint / NaN hole
+    assert np.all(np.abs(rgb[:, inside].astype(int) - 127) <= 1)   # 1500 of (0, 3000)
+
+
+def test_render_rgba_cog(write_test_cog, cog_centre):
+    # what the "web" COG profile writes: uint8 RGB plus an alpha band
+    data = np.full((4, 256, 256), 200, dtype="uint8")
+    data[3] = 255
+    data[3, :64, :64] = 0
+    path = write_test_cog(data, alpha=True)
+
+    z = 13
+    png = _decode(render_tile(path, z, *lonlat_tile(*cog_centre, z)))
+    rgb, alpha = png[:3], png[3]
+    inside = alpha == 255
+    assert inside.any() and (alpha == 0).any()
+    assert (rgb[:, inside] == 200).all()                      # 8-bit passed through
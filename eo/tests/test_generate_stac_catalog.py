@@ -0,0 +1,46 @@
+import numpy as np
+import pystac
+
+from pipeline.generate_stac_catalog import create_derived_catalog
+from utils.bbox_to_h3 import bbox_to_h3
+
+BBOX_A = (-122.6, 37.5, -122.3, 37.9)
+BBOX_B = (2.2, 48.8, 2.5, 49.0)
+MONTHS = [np.datetime64("2024-06"), np.datetime64("2024-07")]
+
+
+def _build(catalog_dir, bbox, epsg, months=MONTHS, **kwargs):
+    create_derived_catalog(None, bbox, epsg, catalog_dir=catalog_dir, months=months, **kwargs).compute()
+    return pystac.Catalog.from_file(str(catalog_dir / "catalog.json"))
+
+
+def _items(catalog):
+    return {item.id: item for item in catalog.get_items(recursive=True)}
+
+
+def test_two_aois_are_merged(tmp_path):
+    _build(tmp_path, BBOX_A, 32610)
+    items = _items(_build(tmp_path, BBOX_B, 32631))
+
+    a, b = bbox_to_h3(BBOX_A, res=10), bbox_to_h3(BBOX_B, res=10)
+    assert set(items) == {
+        f"sentinel-derived-{a}-2024-06", f"sentinel-derived-{a}-2024-07",
+        f"sentinel-derived-{b}-2024-06", f"sentinel-derived-{b}-2024-07",
+    }
+    item = items[f"sentinel-derived-{b}-2024-07"]
+    # newer pystac migrates proj:epsg to proj:code on read
+    assert item.properties.get("proj:epsg", item.properties.get("proj:code")) in (32631, "EPSG:32631")
+    assert item.bbox == list(BBOX_B)
+    assert item.assets["visual"].href.endswith(f"monthly_rgb_{b}_2024-07.tif")
+
+
+def test_rerun_replaces_items_and_keeps_datacube(tmp_path):
+    _build(tmp_path, BBOX_A, 32610, zarr_store="/data/zarr/a.zarr")
+    _build(tmp_path, BBOX_B, 32631)
+    items = _items(_build(tmp_path, BBOX_A, 32610, months=MONTHS[:1]))
+
+    a = bbox_to_h3(BBOX_A, res=10)
+    assert len(items) == 4
+    rerun = items[f"sentinel-derived-{a}-2024-06"]
+    assert rerun.assets["datacube"].href == "/data/zarr/a.zarr"
+    assert "datacube" not in items[f"sentinel-derived-{bbox_to_h3(BBOX_B, res=10)}-2024-06"].assets
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("stackstac")
+pytest.importorskip("rioxarray")
+
+from pipeline.geo_tasks import aoi_epsg, utm_epsg  # noqa: E402
+
+
+class _Item:
+    """Just enough of a pystac.Item for the projection lookup."""
+
+    def __init__(self, **properties):
+        self.properties = properties
+
+
+@pytest.mark.parametrize(
+    "lon, lat, epsg",
+    [
+        (-122.4, 37.7, 32610),      # San Francisco
+        (151.2, -33.9, 32756),      # Sydney, southern hemisphere
+        (179.9, 0.0, 32660),        # antimeridian stays in zone 60
+        (5.3, 60.4, 32632),         # Bergen: Norway widens zone 32 westwards
+        (2.0, 60.4, 32631),         # west of the Norway exception
+        (5.0, 78.0, 32631),         # Svalbard
+        (10.0, 78.0, 32633),
+        (25.0, 78.0, 32635),
+        (35.0, 78.0, 32637),
+        (45.0, 78.0, 32638),        # east of the Svalbard exception
+    ],
+)
+def test_utm_epsg(lon, lat, epsg):
+    assert utm_epsg(lon, lat) == epsg
+
+
+def test_aoi_epsg_without_metadata_uses_centre_zone():
+    assert aoi_epsg((-122.6, 37.5, -122.3, 37.9)) == 32610
+    assert aoi_epsg((-122.6, 37.5, -122.3, 37.9), [_Item(), _Item()]) == 32610
+
+
+def test_aoi_epsg_prefers_majority_native_zone():
+    # AOI centred in zone 10, but most scenes are stored in zone 11
+    items = [_Item(**{"proj:epsg": 32611}), _Item(**{"proj:code": "EPSG:32611"}), _Item(**{"proj:epsg": 32610})]
+    assert aoi_epsg((-121.5, 37.5, -120.7, 37.9), items) == 32611
+
+
+def test_aoi_epsg_tie_falls_back_to_centre_zone():
+    items = [_Item(**{"proj:epsg": 32611}), _Item(**{"proj:epsg": 32610})]
+    assert aoi_epsg((-121.5, 37.5, -120.7, 37.9), items) == 32610
+    assert aoi_epsg((-121.5, 37.5, -120.7, 37.9), list(reversed(items))) == 32610
+
+
+def test_aoi_epsg_explicit_crs():
+    items = [_Item(**{"proj:epsg": 32611})]
+    assert aoi_epsg((-121.5, 37.5, -120.7, 37.9), items, crs=6933) == 6933
+    assert aoi_epsg((-121.5, 37.5, -120.7, 37.9), items, crs="3035") == 3035
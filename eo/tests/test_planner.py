@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+
+import pystac
+
+from pipeline.planner import WorkUnit, cluster_budget, estimate_unit_bytes, plan_batches, work_units
+
+BBOX_A = (-122.6, 37.5, -122.3, 37.9)
+BBOX_B = (2.2, 48.8, 2.5, 49.0)
+
+
+def _unit(bbox, month, est_bytes):
+    return WorkUnit(bbox=bbox, month=month, items=(), est_bytes=est_bytes)
+
+
+def _item(day: str) -> pystac.Item:
+    dt = datetime.fromisoformat(day).replace(tzinfo=timezone.utc)
+    return pystac.Item(id=day, geometry=None, bbox=None, datetime=dt, properties={})
+
+
+def test_cluster_budget():
+    assert cluster_budget(n_workers=4, memory_limit="1GB", fraction=0.5) == 2 * 10 ** 9
+    assert cluster_budget(n_workers=2, memory_limit=1000, fraction=0.25) == 500
+
+
+def test_plan_batches_packs_in_order():
+    units = [_unit(BBOX_A, f"2024-0{m}", 40) for m in range(1, 6)]
+    batches = plan_batches(units, budget=100)
+    assert [[u.month for u in b] for b in batches] == [
+        ["2024-01", "2024-02"], ["2024-03", "2024-04"], ["2024-05"],
+    ]
+    assert [u for b in batches for u in b] == units
+
+
+def test_plan_batches_over_budget_unit_runs_alone(caplog):
+    units = [
+        _unit(BBOX_A, "2024-01", 30),
+        _unit(BBOX_A, "2024-02", 500),
+        _unit(BBOX_B, "2024-01", 30),
+        _unit(BBOX_B, "2024-02", 30),
+    ]
+    batches = plan_batches(units, budget=100)
+    assert [[(u.bbox, u.month) for u in b] for b in batches] == [
+        [(BBOX_A, "2024-01")],
+        [(BBOX_A, "2024-02")],
+        [(BBOX_B, "2024-01"), (BBOX_B, "2024-02")],
+    ]
+    assert "over the" in caplog.text
+
+
+def test_plan_batches_empty():
+    assert plan_batches([], budget=100) == []
+
+
+def test_estimate_grows_with_scenes():
+    one = estimate_unit_bytes(1, BBOX_A)
+    ten = estimate_unit_bytes(10, BBOX_A)
+    assert 0 < one < ten
+
+
+def test_work_units_split_by_month_in_order():
+    items = [_item("2024-07-03"), _item("2024-06-20"), _item("2024-06-05")]
+    units = work_units([(BBOX_A, items)])
+    assert [u.month for u in units] == ["2024-06", "2024-07"]
+    assert [len(u.items) for u in units] == [2, 1]
+    assert units[0].est_bytes > units[1].est_bytes
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("stackstac")
+
+from rasterio.windows import Window  # noqa: E402
+from stackstac.rio_reader import AutoParallelRioReader  # noqa: E402
+
+from utils import resilient_reader  # noqa: E402
+from utils.resilient_reader import make_reader, quarantined_urls, read_failure_report  # noqa: E402
+
+URL = "https://example.com/scene/B04.tif"
+WINDOW = Window(col_off=0, row_off=0, width=4, height=3)
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    monkeypatch.setattr(resilient_reader, "_QUARANTINED", set())
+    monkeypatch.setattr(resilient_reader.time, "sleep", lambda s: None)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Stub AutoParallelRioReader.read: fail `fails` times, then return ones."""
+    state = {"calls": 0, "fails": 0}
+
+    def read(self, window, **kwargs):
+        state["calls"] += 1
+        if state["calls"] <= state["fails"]:
+            raise RuntimeError("HTTP 503")
+        return np.ones((window.height, window.width), dtype=self.dtype)
+
+    monkeypatch.setattr(AutoParallelRioReader, "read", read)
+    return state
+
+
+def _reader(cls):
+    reader = object.__new__(cls)           # skip opening a dataset
+    reader.url = URL
+    reader.dtype = np.dtype("float32")
+    reader.fill_value = np.nan
+    return reader
+
+
+def test_retries_then_succeeds(upstream, tmp_path):
+    upstream["fails"] = 2
+    report = tmp_path / "failed.jsonl"
+    out = _reader(make_reader(report, policy="nodata", retries=2, backoff=0)).read(WINDOW)
+    assert (out == 1).all()
+    assert upstream["calls"] == 3
+    assert read_failure_report(report) == []
+
+
+def test_nodata_policy_fills_window_and_reports(upstream, tmp_path):
+    upstream["fails"] = 99
+    report = tmp_path / "failed.jsonl"
+    out = _reader(make_reader(report, policy="nodata", retries=2, backoff=0)).read(WINDOW)
+    assert out.shape == (3, 4) and np.isnan(out).all()
+    assert upstream["calls"] == 3
+    (row,) = read_failure_report(report)
+    assert row["url"] == URL
+    assert row["attempts"] == 3
+    assert row["policy"] == "nodata"
+    assert row["window"] == [0, 0, 3, 4]
+
+
+def test_raise_policy_reraises(upstream, tmp_path):
+    upstream["fails"] = 99
+    report = tmp_path / "failed.jsonl"
+    with pytest.raises(RuntimeError, match="503"):
+        _reader(make_reader(report, policy="raise", retries=1, backoff=0)).read(WINDOW)
+    assert upstream["calls"] == 2
+    assert len(read_failure_report(report)) == 1
+
+
+def test_quarantine_policy_skips_later_reads(upstream, tmp_path):
+    upstream["fails"] = 99
+    report = tmp_path / "failed.jsonl"
+    reader = _reader(make_reader(report, policy="quarantine", retries=1, backoff=0))
+    reader.read(WINDOW)
+    assert upstream["calls"] == 2
+    out = reader.read(WINDOW)
+    assert np.isnan(out).all()
+    assert upstream["calls"] == 2
+    assert quarantined_urls(report) == {URL}
+
+
+def test_no_report_path_writes_nothing(upstream, tmp_path, monkeypatch):
+    upstream["fails"] = 99
+    monkeypatch.chdir(tmp_path)
+    _reader(make_reader(None, policy="nodata", retries=0, backoff=0)).read(WINDOW)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        make_reader(None, policy="ignore")
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("stackstac")
+pytest.importorskip("rioxarray")
+
+import rasterio  # noqa: E402
+from rasterio.enums import ColorInterp  # noqa: E402
+
+from config.config import COG_PROFILES  # noqa: E402
+from pipeline.geo_tasks import write_cog  # noqa: E402
+from scripts.bench_cog_profiles import synthetic_composite  # noqa: E402
+
+SIZE = 128
+
+
+@pytest.mark.parametrize("profile", [p for p in COG_PROFILES if "rescale" not in COG_PROFILES[p]])
+def test_float_profiles(tmp_path, profile):
+    out = write_cog(synthetic_composite(SIZE), tmp_path / "out.tif", profile=profile)
+    with rasterio.open(out) as src:
+        assert src.count == 3 and src.dtypes[0] == "float32"
+        assert src.compression.name.upper() == COG_PROFILES[profile]["compress"]
+        assert np.isnan(src.read(1)[0, 0])                # nodata hole kept
+
+
+@pytest.mark.parametrize("profile", [p for p in COG_PROFILES if "rescale" in COG_PROFILES[p]])
+def test_rescaled_profiles_write_rgba(tmp_path, profile):
+    out = write_cog(synthetic_composite(SIZE), tmp_path / "out.tif", profile=profile)
+    with rasterio.open(out) as src:
+        assert src.count == 4 and src.dtypes[0] == "uint8"
+        assert src.colorinterp[-1] == ColorInterp.alpha
+        alpha = src.read(4)
+    assert alpha[0, 0] == 0 and alpha[-1, -1] == 255       # nodata lives in alpha
+
+
+def test_rescale_computes_composite_once(tmp_path):
+    profile = next(p for p in COG_PROFILES if "rescale" in COG_PROFILES[p])
+    calls = []
+
+    def tracked(block):
+        calls.append(1)
+        return block
+
+    da = synthetic_composite(SIZE).chunk({"band": -1, "y": -1, "x": -1})
+    da = da.copy(data=da.data.map_blocks(tracked, dtype=da.dtype, meta=np.array((), dtype=da.dtype)))
+    write_cog(da, tmp_path / "out.tif", profile=profile)
+    assert len(calls) == 1
+
+
+def test_compress_override_and_unknown_profile(tmp_path):
+    out = write_cog(synthetic_composite(SIZE), tmp_path / "out.tif", profile="default", compress="LZW")
+    with rasterio.open(out) as src:
+        assert src.compression.name.upper() == "LZW"
+    with pytest.raises(ValueError):
+        write_cog(synthetic_composite(SIZE), tmp_path / "bad.tif", profile="nope")
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("stackstac")
+pytest.importorskip("rioxarray")
+
+import xarray as xr  # noqa: E402
+
+from pipeline.geo_tasks import save_monthly_zarr  # noqa: E402
+from scripts.bench_cog_profiles import synthetic_composite  # noqa: E402
+
+BBOX = (-122.6, 37.5, -122.3, 37.9)
+CHUNKS = {"time": 1, "band": 3, "y": 16, "x": 16}
+
+
+def _months(*months, seed=0, size=32):
+    da = synthetic_composite(size, seed=seed)
+    return xr.concat(
+        [da.expand_dims(time=[np.datetime64(f"{m}-01")]) for m in months], dim="time"
+    ).transpose("time", "band", "y", "x")
+
+
+def _save(da, store):
+    return save_monthly_zarr(da, BBOX, store=store, chunks=CHUNKS)
+
+
+def test_append_adds_only_new_months(tmp_path):
+    store = tmp_path / "cube.zarr"
+    june = _months("2024-06")
+    _save(june, store)
+    _save(_months("2024-06", "2024-07", seed=1), store)    # June already there: not rewritten
+
+    cube = xr.open_zarr(store)
+    assert [str(t)[:7] for t in cube.time.values] == ["2024-06", "2024-07"]
+    assert cube.rgb.dims == ("time", "band", "y", "x")
+    np.testing.assert_array_equal(cube.rgb.isel(time=0).values, june.isel(time=0).values)
+    assert cube.rio.crs == june.rio.crs
+
+    _save(_months("2024-07"), store)                        # nothing new: no-op
+    assert xr.open_zarr(store).sizes["time"] == 2
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda da: da.assign_coords(x=da.x + 10),           # shifted grid
+        lambda da: da.isel(y=slice(0, 16)),                 # smaller AOI
+        lambda da: da.assign_coords(band=["nir", "green", "blue"]),
+        lambda da: da.rio.write_crs("EPSG:32611"),
+    ],
+)
+def test_append_refuses_mismatched_grid(tmp_path, change):
+    store = tmp_path / "cube.zarr"
+    _save(_months("2024-06"), store)
+    with pytest.raises(ValueError):
+        _save(change(_months("2024-07")), store)
+    assert xr.open_zarr(store).sizes["time"] == 1
@@ -0,0 +1,107 @@
+import logging
+import math
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import rasterio
+from rasterio.enums import ColorInterp, Resampling
+from rasterio.io import MemoryFile
+from rasterio.transform import from_bounds
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_bounds
+
+from config.settings import TILE_SIZE, TILE_CACHE_SIZE, TILE_RESCALE
+
+logger = logging.getLogger(__name__)
+
+# Half the web-mercator (EPSG:3857) world extent in metres
+_ORIGIN = 20037508.342789244
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """
+    Return the EPSG:3857 bounds (minx, miny, maxx, maxy) of XYZ tile z/x/y.
+    """
+    span = 2 * _ORIGIN / 2 ** z
+    minx = -_ORIGIN + x * span
+    maxy = _ORIGIN - y * span
+    return minx, maxy - span, minx + span, maxy
+
+
+def _overview_level(src, bounds: Tuple[float, float, float, float]) -> Optional[int]:
+    """
+    Pick the coarsest overview that is still at least as fine as the tile.
+
+    Mercator metres are stretched by 1/cos(lat), so the tile resolution is
+    scaled back to ground metres at the tile centre before comparing with
+    the (UTM) source resolution. Returns None to read full resolution.
+    """
+    tile_res = (bounds[2] - bounds[0]) / TILE_SIZE
+    centre_y = (bounds[1] + bounds[3]) / 2
+    lat = math.degrees(2 * math.atan(math.exp(centre_y / 6378137.0)) - math.pi / 2)
+    ground_res = tile_res * math.cos(math.radians(lat))
+
+    level = None
+    for i, factor in enumerate(src.overviews(1)):
+        if src.res[0] * factor <= ground_res:
+            level = i
+    return level
+
+
+def render_tile(path: str, z: int, x: int, y: int) -> Optional[bytes]:
+    """
+    Render tile z/x/y of an RGB COG as an RGBA PNG.
+
+    Reads from the overview matching the zoom, warps it onto the tile grid and
+    stretches TILE_RESCALE to 0-255 (8-bit COGs are passed through).
+    Returns None if the tile misses the COG.
+    """
+    bounds = tile_bounds(z, x, y)
+    with rasterio.open(path) as src:
+        west, south, east, north = transform_bounds(src.crs, "EPSG:3857", *src.bounds)
+        if bounds[0] >= east or bounds[2] <= west or bounds[1] >= north or bounds[3] <= south:
+            return None
+        level = _overview_level(src, bounds)
+
+    open_kwargs = {} if level is None else {"overview_level": level}
+    with rasterio.open(path, **open_kwargs) as src:
+        # RGBA COGs (the "web" profile) carry their own alpha and GDAL warps it
+        # along; otherwise add one. Either way it is the VRT's last band and is
+        # 0 outside the COG footprint.
+        has_alpha = src.colorinterp[-1] == ColorInterp.alpha
+        with WarpedVRT(
+            src,
+            crs="EPSG:3857",
+            transform=from_bounds(*bounds, TILE_SIZE, TILE_SIZE),
+            width=TILE_SIZE,
+            height=TILE_SIZE,
+            resampling=Resampling.bilinear,
+            src_alpha=src.count if has_alpha else 0,
+            add_alpha=not has_alpha,
+        ) as vrt:
+            data = vrt.read(indexes=[1, 2, 3]).astype("float32")
+            mask = vrt.read(vrt.count)
+        already_8bit = src.dtypes[0] == "uint8"       # e.g. the "web" COG profile
+
+    lo, hi = (0, 255) if already_8bit else TILE_RESCALE
+    finite = np.isfinite(data).all(axis=0)
+    rgb = np.clip((np.nan_to_num(data) - lo) * 255.0 / (hi - lo), 0, 255).astype("uint8")
+    alpha = np.where(finite, mask, 0).astype("uint8")
+
+    with MemoryFile() as mem:
+        with mem.open(driver="PNG", width=TILE_SIZE, height=TILE_SIZE,
+                      count=4, dtype="uint8") as dst:
+            dst.write(np.concatenate([rgb, alpha[None]]))
+        return mem.read()
+
+
+@lru_cache(maxsize=TILE_CACHE_SIZE)
+def cached_tile(path: str, mtime: float, z: int, x: int, y: int) -> Optional[bytes]:
+    """
+    LRU-cached render_tile. `mtime` is part of the key so a rewritten COG
+    never serves stale tiles.
+    """
+    logger.debug("Rendering %s %d/%d/%d", Path(path).name, z, x, y)
+    return render_tile(path, z, x, y)
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import random
+import time
+from pathlib import Path
+from typing import List, Set, Type
+
+import numpy as np
+from stackstac.rio_reader import AutoParallelRioReader
+
+from config.config import READ_FAILURE_POLICIES, READ_FAILURE_POLICY, READ_RETRIES, READ_BACKOFF
+
+logger = logging.getLogger(__name__)
+
+# scenes quarantined by this worker process; other processes learn about them
+# through the report (see quarantined_urls)
+_QUARANTINED: Set[str] = set()
+
+
+def make_reader(
+    report_path: str | Path | None,
+    policy: str = READ_FAILURE_POLICY,
+    retries: int = READ_RETRIES,
+    backoff: float = READ_BACKOFF,
+) -> Type[AutoParallelRioReader]:
+    """
+    Build a stackstac reader class that retries every chunk read with
+    exponential backoff and, once retries are exhausted, applies `policy`
+    and appends the failure to `report_path` (JSON lines; None = log only).
+    """
+    if policy not in READ_FAILURE_POLICIES:
+        raise ValueError(f"policy must be one of {READ_FAILURE_POLICIES}, got {policy!r}")
+    report_path = str(report_path) if report_path else None
+
+    class ResilientReader(AutoParallelRioReader):
+        def read(self, window, **kwargs) -> np.ndarray:
+            if self.url in _QUARANTINED:
+                return self._nodata(window)
+
+            for attempt in range(retries + 1):
+                try:
+                    return super().read(window, **kwargs)
+                except Exception as exc:  # stackstac wraps rasterio errors in RuntimeError
+                    error = exc
+                    if attempt < retries:
+                        delay = backoff * 2 ** attempt * (1 + 0.25 * random.random())
+                        logger.debug("Retry %d/%d for %s in %.1fs: %s",
+                                     attempt + 1, retries, self.url, delay, exc)
+                        time.sleep(delay)
+
+            _record_failure(report_path, self.url, window, retries + 1, error, policy)
+            if policy == "raise":
+                raise error
+            if policy == "quarantine":
+                _QUARANTINED.add(self.url)
+            return self._nodata(window)
+
+        def _nodata(self, window) -> np.ndarray:
+            return np.full((window.height, window.width), self.fill_value, dtype=self.dtype)
+
+    return ResilientReader
+
+
+def _record_failure(report_path: str | None, url: str, window, attempts: int, error: Exception, policy: str) -> None:
+    logger.warning("Read failed after %d attempt(s), policy=%s: %s (%s)", attempts, policy, url, error)
+    if report_path is None:
+        return
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    line = json.dumps({
+        "url": url,
+        "window": [window.row_off, window.col_off, window.height, window.width],
+        "attempts": attempts,
+        "error": f"{type(error).__name__}: {error}",
+        "policy": policy,
+        "time": time.time(),
+    })
+    # single small O_APPEND write per failure, safe across worker processes
+    with open(report_path, "a") as f:
+        f.write(line + "\n")
+
+
+def read_failure_report(report_path: str | Path) -> List[dict]:
+    """Parse a failed-read report; an absent report means no failures."""
+    path = Path(report_path)
+    if not path.exists():
+        return []
+    with path.open() as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def quarantined_urls(report_path: str | Path) -> Set[str]:
+    """Asset URLs quarantined so far by any worker writing to this report."""
+    return {r["url"] for r in read_failure_report(report_path) if r["policy"] == "quarantine"}